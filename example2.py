@@ -21,18 +21,13 @@ async def run_power_toggle(conn: RotelAmpConn) -> None:
 
 async def run_misc_commands(conn: RotelAmpConn) -> None:
     await asyncio.sleep(3)
+    # No sleeps needed between commands: the connection paces them
     await send_command_and_log(conn, "DISPLAY_REFRESH")
-    await asyncio.sleep(0.5)
     await send_command_and_log(conn, "RECORD_FUNCTION_SELECT")
-    await asyncio.sleep(0.5)
     await send_command_and_log(conn, "TONE_CONTROL_SELECT")
-    await asyncio.sleep(0.5)
     await send_command_and_log(conn, "TREBLE_UP")
-    await asyncio.sleep(0.5)
     await send_command_and_log(conn, "RECORD_FUNCTION_SELECT")
-    await asyncio.sleep(0.5)
     await send_command_and_log(conn, "TONE_CONTROL_SELECT")
-    await asyncio.sleep(0.5)
     await send_command_and_log(conn, "TREBLE_DOWN")
     await asyncio.sleep(3)
 
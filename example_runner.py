@@ -7,7 +7,6 @@ from typing import Awaitable, Callable, List
 from rsp1570serial.connection import RotelAmpConn
 from rsp1570serial.emulator import EMULATOR_DEFAULT_PORT
 from rsp1570serial.messages import FeedbackMessage, SmartDisplayMessage, TriggerMessage
-from rsp1570serial.protocol import decode_protocol_stream
 from rsp1570serial.rotel_model_meta import ROTEL_MODELS
 
 COMMAND_DEFAULT_SERIAL_PORT = f"socket://:{EMULATOR_DEFAULT_PORT}"
@@ -61,7 +60,7 @@ def process_example_args(example_names: List[str]):
         "-l",
         "--log-payload",
         action="store_true",
-        help="log the payload in each message instead of the decoded message",  # Doesn't work with shared conn
+        help="log the payload in each message instead of the decoded message",
     )
     return parser.parse_args()
 
@@ -93,12 +92,18 @@ async def send_volume_direct_command_and_log(conn, zone, volume):
 
 
 async def payload_logger(conn):
+    def log_payload(payload):
+        logging.info("response payload: %r", payload)
+        logging.info("response payload base64: %s", base64.b64encode(payload))
+
+    remove_callback = conn.add_payload_callback(log_payload)
     try:
-        async for payload in decode_protocol_stream(conn.reader):
-            logging.info("response payload: %r", payload)
-            logging.info("response payload base64: %s", base64.b64encode(payload))
+        # The callback does the work; wait here until cancelled
+        await asyncio.get_running_loop().create_future()
     except asyncio.CancelledError:
         logging.info("Payload Logger cancelled")
+    finally:
+        remove_callback()
 
 
 async def message_logger(conn):
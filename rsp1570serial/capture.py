@@ -0,0 +1,198 @@
+"""
+Decode raw RS-232 captures of Rotel protocol traffic
+
+A capture is simply the bytes received from the device, as written to a file.
+Files are memory-mapped and decoded a chunk at a time so memory use is
+constant whatever the size of the capture.
+
+Large captures can also be decoded on all cores with
+decode_capture_file_parallel.   The file is split just before a START_BYTE,
+the parts are decoded in worker processes and the results are merged in order.
+"""
+
+import argparse
+import logging
+import mmap
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Iterator, List, Optional, Tuple
+
+from rsp1570serial.messages import AnyMessage, MessageCodec
+from rsp1570serial.protocol import START_BYTE, FrameParser, RotelProtocolError
+from rsp1570serial.rotel_model_meta import ROTEL_MODELS, RotelModelMeta
+
+_LOGGER = logging.getLogger(__name__)
+
+CAPTURE_CHUNK_SIZE = 1024 * 1024
+
+
+def decode_capture_payloads(
+    path: str, chunk_size: int = CAPTURE_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    Yield the payload of each message in a capture file
+
+    Errors are logged and discarded as in decode_protocol_stream.
+    """
+    parser = FrameParser()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for start in range(0, len(mm), chunk_size):
+                for event in parser.feed(mm[start : start + chunk_size]):
+                    if isinstance(event, RotelProtocolError):
+                        _LOGGER.error(event)
+                    else:
+                        yield bytes(event)
+    for event in parser.close():
+        _LOGGER.error(event)
+
+
+def decode_capture_file(
+    path: str, meta: RotelModelMeta, chunk_size: int = CAPTURE_CHUNK_SIZE
+) -> Iterator[AnyMessage]:
+    """Yield each message in a capture file"""
+    codec = MessageCodec(meta)
+    for payload in decode_capture_payloads(path, chunk_size):
+        message = codec.try_decode_message(payload)
+        if message is not None:
+            yield message
+
+
+def _decode_range(
+    mm: mmap.mmap,
+    start: int,
+    end: int,
+    codec: MessageCodec,
+    parser: FrameParser,
+    chunk_size: int = CAPTURE_CHUNK_SIZE,
+) -> List[AnyMessage]:
+    messages = []
+    for chunk_start in range(start, end, chunk_size):
+        chunk = mm[chunk_start : min(chunk_start + chunk_size, end)]
+        for event in parser.feed(chunk):
+            if isinstance(event, RotelProtocolError):
+                _LOGGER.error(event)
+                continue
+            message = codec.try_decode_message(bytes(event))
+            if message is not None:
+                messages.append(message)
+    return messages
+
+
+def _decode_capture_part(
+    path: str, start: int, end: int, meta: RotelModelMeta
+) -> Tuple[List[AnyMessage], FrameParser]:
+    """Worker: decode part of a capture and return the final parser state"""
+    parser = FrameParser()
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            messages = _decode_range(mm, start, end, MessageCodec(meta), parser)
+    return messages, parser
+
+
+def split_capture(mm: mmap.mmap, part_count: int) -> List[Tuple[int, int]]:
+    """
+    Split a capture into up to part_count (start, end) ranges
+
+    Every range except the first starts with a START_BYTE.
+    """
+    size = len(mm)
+    starts = [0]
+    for i in range(1, part_count):
+        pos = mm.find(bytes([START_BYTE]), max(size * i // part_count, starts[-1] + 1))
+        if pos == -1:
+            break
+        if pos > starts[-1]:
+            starts.append(pos)
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def decode_capture_file_parallel(
+    path: str,
+    meta: RotelModelMeta,
+    max_workers: Optional[int] = None,
+    part_count: Optional[int] = None,
+) -> Iterator[AnyMessage]:
+    """
+    Yield each message in a capture file, decoding on multiple processes
+
+    The results are exactly those of decode_capture_file.   A part that
+    starts with a START_BYTE decodes identically on its own unless the
+    previous part ended part way through a message (i.e. the line glitched
+    at the boundary).   In that case the part is decoded again here,
+    carrying on from the previous part's parser state.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if part_count is None:
+        part_count = max_workers * 4
+    codec = MessageCodec(meta)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            parts = split_capture(mm, part_count)
+            with ProcessPoolExecutor(max_workers) as executor:
+                results = executor.map(
+                    _decode_capture_part,
+                    repeat(path),
+                    [start for start, _ in parts],
+                    [end for _, end in parts],
+                    repeat(meta),
+                )
+                prev_parser: Optional[FrameParser] = None
+                for (start, end), (messages, parser) in zip(parts, results):
+                    if prev_parser is not None and prev_parser.in_message:
+                        _LOGGER.debug("Redecoding part at %d sequentially", start)
+                        messages = _decode_range(mm, start, end, codec, prev_parser)
+                        parser = prev_parser
+                    yield from messages
+                    prev_parser = parser
+    if prev_parser is not None:
+        for event in prev_parser.close():
+            _LOGGER.error(event)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Decode a raw RS-232 capture file")
+    parser.add_argument(
+        "-m",
+        "--model",
+        choices=list(ROTEL_MODELS.keys()),
+        default="rsp1570",
+        help="model of device that was captured",
+    )
+    parser.add_argument(
+        "-c",
+        "--count",
+        action="store_true",
+        help="only report the number of messages of each type",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of processes to decode with (0 for one per core)",
+    )
+    parser.add_argument("path", help="capture file to decode")
+    args = parser.parse_args()
+
+    meta = ROTEL_MODELS[args.model]
+    if args.jobs == 1:
+        messages = decode_capture_file(args.path, meta)
+    else:
+        messages = decode_capture_file_parallel(args.path, meta, args.jobs or None)
+    counts: Counter = Counter()
+    for message in messages:
+        counts[type(message).__name__] += 1
+        if not args.count:
+            message.log()
+    for name, count in sorted(counts.items()):
+        print("{}: {}".format(name, count))
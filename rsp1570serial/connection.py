@@ -1,67 +1,880 @@
 import asyncio
-from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+import logging
+import random
+from collections import deque
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass
+from enum import Enum
+from typing import (
+    Any,
+    AsyncGenerator,
+    Callable,
+    Deque,
+    Generic,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+)
 
 from serial import PARITY_NONE, STOPBITS_ONE  # type: ignore[import-untyped]
-from serial_asyncio_fast import open_serial_connection  # type: ignore[import-untyped]
+from serial_asyncio_fast import (  # type: ignore[import-untyped]
+    create_serial_connection,
+    open_serial_connection,
+)
 
-from rsp1570serial.messages import AnyMessage, MessageCodec
+from rsp1570serial.events import (
+    AmpEvent,
+    AmpStateTracker,
+    ConnectionState,
+    ConnectionStateChanged,
+)
+from rsp1570serial.messages import (
+    AnyMessage,
+    FeedbackMessage,
+    MessageCodec,
+    SmartDisplayMessage,
+)
+from rsp1570serial.protocol import (
+    BUFFERED_READ_SIZE,
+    DuplicatePayloadFilter,
+    FrameParser,
+    RotelProtocolError,
+)
 from rsp1570serial.rotel_model_meta import RotelModelMeta
 
+_LOGGER = logging.getLogger(__name__)
+
+MessageCallback = Callable[[AnyMessage], None]
+PayloadCallback = Callable[[bytes], None]
+ConnectionStateCallback = Callable[[ConnectionStateChanged], None]
+
+DEFAULT_SUBSCRIPTION_DEPTH = 256
+
+_T = TypeVar("_T")
+
+
+class RotelAmpProtocol(asyncio.Protocol):
+    """
+    asyncio Protocol that decodes messages as soon as data is received
+
+    Each decoded message is passed straight to message_callback so there
+    is no reader task and no async generator involved.   If payload_callback
+    is set then it is passed every valid payload before it is decoded.
+    """
+
+    def __init__(
+        self,
+        codec: MessageCodec,
+        message_callback: MessageCallback,
+        resync: bool = False,
+        duplicate_window: Optional[float] = None,
+        payload_callback: Optional[PayloadCallback] = None,
+    ):
+        self.codec = codec
+        self.message_callback = message_callback
+        self.payload_callback = payload_callback
+        self.parser = FrameParser(resync, codec.protocol_stats)
+        self.duplicate_filter = None
+        if duplicate_window is not None:
+            self.duplicate_filter = DuplicatePayloadFilter(duplicate_window)
+        self.transport: Optional[asyncio.Transport] = None
+        self.closed: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data: bytes):
+        self._handle_events(self.parser.feed(data))
+
+    def connection_lost(self, exc: Optional[Exception]):
+        self._handle_events(self.parser.close())
+        self.transport = None
+        if not self.closed.done():
+            self.closed.set_result(exc)
+
+    def _handle_events(self, events):
+        for event in events:
+            if isinstance(event, RotelProtocolError):
+                _LOGGER.error(event)
+                continue
+            assert isinstance(event, bytes)
+            if self.payload_callback is not None:
+                self.payload_callback(event)
+            if self.codec.is_duplicate(event, self.duplicate_filter):
+                continue
+            message = self.codec.try_decode_message(event)
+            if message is not None:
+                self.message_callback(message)
+
+
+class OverflowPolicy(Enum):
+    """Which messages a MessageSubscription drops (see MessageSubscription)"""
+
+    # Keep the message and pause reading until the consumer catches up
+    BLOCK = "block"
+    # Drop the oldest queued message to make room
+    DROP_OLDEST = "drop_oldest"
+    # Drop the new message
+    DROP_NEWEST = "drop_newest"
+    # Only queue the latest message of each kind (see _message_kind)
+    KEEP_LATEST = "keep_latest"
+
+
+def _message_kind(message: Any) -> Tuple[type, Optional[int]]:
+    """Messages of the same kind describe the same state so replace each other"""
+    if isinstance(message, SmartDisplayMessage):
+        return (SmartDisplayMessage, message.start)
+    return (type(message), None)
+
+
+SubscriptionCallback = Callable[["MessageSubscription"], None]
+
+
+class MessageSubscription(Generic[_T]):
+    """
+    Queue of the messages received by a RotelAmpConn for one consumer
+
+    Created by RotelAmpConn.subscribe.   Every subscription is given each
+    decoded message so consumers never compete for messages.   The queue
+    holds at most max_depth messages and overflow decides which messages are
+    dropped:
+
+    * DROP_OLDEST: when full, drop the oldest queued message
+    * DROP_NEWEST: when full, drop the new message
+    * KEEP_LATEST: whether or not the queue is full, a new message replaces
+      any queued message of the same kind (e.g. the previous
+      FeedbackMessage) so the consumer only sees the latest state.   If the
+      queue is still full then the oldest message is dropped.
+    * BLOCK: never drop anything.   Instead reading from the amp is paused
+      until the consumer catches up.   This holds up every other consumer
+      and the amp's output backs up in the serial buffers.   Messages that
+      were received in the same chunk are still queued so the queue can
+      briefly exceed max_depth.
+
+    The number of messages dropped, including those replaced under
+    KEEP_LATEST, is counted in dropped.   RotelAmpConn.events also uses a
+    subscription to queue AmpEvents rather than messages.
+
+    get returns None, and iteration stops, once the connection has closed
+    and the queued messages have been consumed.   Closing a subscription
+    (or leaving its with block) unsubscribes it.   This never affects the
+    reader or the other subscriptions.
+    """
+
+    def __init__(
+        self,
+        max_depth: int = DEFAULT_SUBSCRIPTION_DEPTH,
+        overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        on_close: Optional[SubscriptionCallback] = None,
+        on_pause: Optional[SubscriptionCallback] = None,
+        on_resume: Optional[SubscriptionCallback] = None,
+    ):
+        if max_depth < 1:
+            raise ValueError("max_depth must be at least 1")
+        self.max_depth = max_depth
+        self.overflow = overflow
+        self.dropped = 0
+        self._on_close = on_close
+        self._on_pause = on_pause
+        self._on_resume = on_resume
+        self._messages: Deque[_T] = deque()
+        self._closed = False
+        self._paused = False
+        self._available = asyncio.Event()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def paused(self) -> bool:
+        """True while this subscription has paused reading (BLOCK only)"""
+        return self._paused
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def put(self, message: _T):
+        if self._closed:
+            return
+        messages = self._messages
+        overflow = self.overflow
+        if overflow is OverflowPolicy.KEEP_LATEST:
+            kind = _message_kind(message)
+            for i, queued in enumerate(messages):
+                if _message_kind(queued) == kind:
+                    del messages[i]
+                    self.dropped += 1
+                    break
+        if len(messages) >= self.max_depth:
+            if overflow is OverflowPolicy.BLOCK:
+                pass
+            elif overflow is OverflowPolicy.DROP_NEWEST:
+                self._count_overflow()
+                return
+            else:
+                messages.popleft()
+                self._count_overflow()
+        messages.append(message)
+        self._available.set()
+        if (
+            overflow is OverflowPolicy.BLOCK
+            and not self._paused
+            and len(messages) >= self.max_depth
+        ):
+            self._paused = True
+            if self._on_pause is not None:
+                self._on_pause(self)
+
+    def _count_overflow(self):
+        if self.dropped == 0:
+            _LOGGER.warning(
+                "Subscription is full (max_depth %d), dropping messages",
+                self.max_depth,
+            )
+        self.dropped += 1
+
+    def _resume(self):
+        self._paused = False
+        if self._on_resume is not None:
+            self._on_resume(self)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._available.set()
+        if self._paused:
+            self._resume()
+        if self._on_close is not None:
+            self._on_close(self)
+
+    async def get(self) -> Optional[_T]:
+        while not self._messages:
+            if self._closed:
+                return None
+            self._available.clear()
+            await self._available.wait()
+        message = self._messages.popleft()
+        if self._paused and len(self._messages) < self.max_depth:
+            self._resume()
+        return message
+
+    def __enter__(self) -> "MessageSubscription[_T]":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __aiter__(self) -> "MessageSubscription[_T]":
+        return self
+
+    async def __anext__(self) -> _T:
+        message = await self.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+
+@dataclass(frozen=True)
+class ReconnectPolicy:
+    """
+    How RotelAmpConn reopens the port after losing it
+
+    The delay before retry n (counting from 0) is
+    initial_delay * multiplier ** n, capped at max_delay, and then varied at
+    random by up to jitter times itself so that amps that were lost together
+    don't all retry together.
+
+    Commands sent while reconnecting are queued and replayed in order once
+    the port is back.   At most max_queued commands are kept; sending
+    another raises ConnectionError so that a long outage can't build up a
+    backlog of stale commands (e.g. a whole volume ramp).
+    """
+
+    initial_delay: float = 0.5
+    max_delay: float = 30.0
+    multiplier: float = 2.0
+    jitter: float = 0.25
+    max_queued: int = 8
+
+    def delay(self, attempt: int) -> float:
+        delay = min(
+            self.max_delay, self.initial_delay * self.multiplier ** min(attempt, 64)
+        )
+        return delay * (1.0 + self.jitter * random.uniform(-1.0, 1.0))
+
+
+@dataclass(frozen=True)
+class PacingPolicy:
+    """
+    How fast RotelAmpConn writes commands
+
+    The amp drops commands if they arrive faster than it can process them,
+    so commands are queued and written by a single writer task.   Each frame
+    is written at least min_interval seconds after the one before it.   A
+    command is in flight from when it is written until a FeedbackMessage is
+    received or response_timeout seconds have passed (not every command gets
+    a response).   No more than max_in_flight commands are in flight at a
+    time.   The limit is approximate: the amp's responses can't be matched to
+    commands, so any FeedbackMessage, including the repeats sent while muted,
+    is taken as the response to the oldest command.
+    """
+
+    min_interval: float = 0.05
+    max_in_flight: int = 2
+    response_timeout: float = 0.5
+
 
 class RotelAmpConn:
-    """Basic connection to a Rotel Amp"""
+    """
+    Basic connection to a Rotel Amp
+
+    By default the connection is built on a StreamReader/StreamWriter pair
+    and a single reader task, started by open, feeds everything received to
+    a RotelAmpProtocol.   If use_protocol is True then the connection is
+    built on a RotelAmpProtocol transport instead and there is no reader
+    task.   Either way each message is decoded once and then dispatched to
+    any callbacks registered with add_message_callback and to every
+    subscription (see subscribe and read_messages).
+
+    If resync is True then an unexpected START_BYTE within a message is
+    treated as the start of a new message (see FrameParser).
 
-    def __init__(self, serial_port: str, meta: RotelModelMeta):
+    If duplicate_window is set then a message that is byte-identical to one
+    received within the last duplicate_window seconds is dropped before it
+    is decoded (see DuplicatePayloadFilter).   This stops the repeated
+    feedback messages sent while muted from reaching consumers.
+
+    If reconnect is set then the connection is supervised: if the port is
+    lost (e.g. the USB-serial adapter resets) it is reopened with the delays
+    given by the ReconnectPolicy until it succeeds or close is called.
+    Subscriptions and callbacks carry on across the gap, commands sent while
+    the port is down are queued (up to ReconnectPolicy.max_queued) and
+    replayed once it is back, and a DISPLAY_REFRESH is sent first so that
+    consumers see the current state.
+    The first open is not retried.   Connection state changes are reported
+    to callbacks registered with add_connection_state_callback.
+
+    Commands are paced as given by pacing (see PacingPolicy).   send_command
+    and send_volume_direct_command return once the command has been written.
+
+    Health counters for everything received are available in
+    codec.stats and codec.protocol_stats.
+    """
+
+    def __init__(
+        self,
+        serial_port: str,
+        meta: RotelModelMeta,
+        use_protocol: bool = False,
+        resync: bool = False,
+        duplicate_window: Optional[float] = None,
+        reconnect: Optional[ReconnectPolicy] = None,
+        pacing: Optional[PacingPolicy] = None,
+    ):
         self.serial_port = serial_port
         self.meta = meta
+        self.use_protocol = use_protocol
+        self.resync = resync
+        self.duplicate_window = duplicate_window
+        self.reconnect = reconnect
+        self.pacing = pacing if pacing is not None else PacingPolicy()
+        self.codec = MessageCodec(meta)
+        # The latest FeedbackMessage, kept undecoded (see last_known)
+        self.last_feedback: Optional[FeedbackMessage] = None
+        # Only updated while events() has consumers
+        self.state_tracker = AmpStateTracker()
         self.reader = None
         self.writer = None
+        self.transport = None
+        self.protocol: Optional[RotelAmpProtocol] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._state = ConnectionState.DISCONNECTED
+        self._message_callbacks: List[MessageCallback] = []
+        self._payload_callbacks: List[PayloadCallback] = []
+        self._connection_state_callbacks: List[ConnectionStateCallback] = []
+        self._subscriptions: Set[MessageSubscription[AnyMessage]] = set()
+        self._event_subscriptions: Set[MessageSubscription[AmpEvent]] = set()
+        # Subscriptions with the BLOCK policy that are full
+        self._paused_by: Set[MessageSubscription] = set()
+        self._reading_allowed: Optional[asyncio.Event] = None
+        # Frames waiting for the writer task and the futures of their senders
+        self._outbound: Deque[Tuple[bytes, asyncio.Future]] = deque()
+        self._outbound_ready: Optional[asyncio.Event] = None
+        # When each command in flight stops counting as in flight
+        self._in_flight: Deque[float] = deque()
+        self._response_received: Optional[asyncio.Event] = None
+        self._last_write_time = 0.0
 
     @property
     def is_open(self) -> bool:
-        return self.writer is not None
+        return self.writer is not None or self.transport is not None
+
+    @property
+    def state(self) -> ConnectionState:
+        return self._state
+
+    def _set_state(self, state: ConnectionState):
+        if state is self._state:
+            return
+        _LOGGER.debug("Connection to %s is %s", self.serial_port, state.value)
+        self._state = state
+        event = ConnectionStateChanged(state)
+        for callback in list(self._connection_state_callbacks):
+            callback(event)
+
+    def _create_protocol(self) -> RotelAmpProtocol:
+        return RotelAmpProtocol(
+            self.codec,
+            self._dispatch_message,
+            self.resync,
+            self.duplicate_window,
+            self._dispatch_payload,
+        )
 
     async def open(self):
-        if self.writer is not None:
+        if self.is_open or self._reconnect_task is not None:
             raise RuntimeError("RotelAmpConn is already open")
-        self.reader, self.writer = await open_serial_connection(
-            url=self.serial_port,
-            baudrate=115200,
-            timeout=None,
-            parity=PARITY_NONE,
-            stopbits=STOPBITS_ONE,
-        )
+        self._reading_allowed = asyncio.Event()
+        if not self._paused_by:
+            self._reading_allowed.set()
+        self._outbound_ready = asyncio.Event()
+        self._response_received = asyncio.Event()
+        await self._open_port()
+        self._set_state(ConnectionState.CONNECTED)
+        self._writer_task = asyncio.create_task(self._write_outbound())
+
+    async def _open_port(self):
+        if self.use_protocol:
+            transport, protocol = await create_serial_connection(
+                asyncio.get_running_loop(),
+                self._create_protocol,
+                url=self.serial_port,
+                baudrate=115200,
+                timeout=None,
+                parity=PARITY_NONE,
+                stopbits=STOPBITS_ONE,
+            )
+            if self._paused_by:
+                transport.pause_reading()
+            self.transport, self.protocol = transport, protocol
+        else:
+            reader, writer = await open_serial_connection(
+                url=self.serial_port,
+                baudrate=115200,
+                timeout=None,
+                parity=PARITY_NONE,
+                stopbits=STOPBITS_ONE,
+            )
+            protocol = self._create_protocol()
+            self.reader, self.writer, self.protocol = reader, writer, protocol
+            self._reader_task = asyncio.create_task(self._read_stream(reader, protocol))
+        protocol.closed.add_done_callback(self._on_protocol_closed)
+
+    async def _read_stream(
+        self, reader: asyncio.StreamReader, protocol: RotelAmpProtocol
+    ):
+        """Reader task: feed everything read from the stream to the protocol"""
+        assert self._reading_allowed is not None
+        exc: Optional[Exception] = None
+        try:
+            while True:
+                await self._reading_allowed.wait()
+                data = await reader.read(BUFFERED_READ_SIZE)
+                if not data:
+                    break
+                protocol.data_received(data)
+        except Exception as e:
+            _LOGGER.error("Error reading from %s: %r", self.serial_port, e)
+            exc = e
+        finally:
+            protocol.connection_lost(exc)
 
     async def close(self):
+        self._closing = True
+        try:
+            for task in (self._writer_task, self._reconnect_task):
+                if task is not None:
+                    task.cancel()
+                    with suppress(asyncio.CancelledError):
+                        await task
+            self._writer_task = None
+            self._reconnect_task = None
+            await self._close_port()
+        finally:
+            self._closing = False
+        self._discard_outbound()
+        self._close_subscriptions()
+        self._set_state(ConnectionState.DISCONNECTED)
+
+    async def _close_port(self):
         if self.writer is not None:
+            assert self._reader_task is not None
             self.writer.close()
-            await self.writer.wait_closed()
+            with suppress(OSError):
+                await self.writer.wait_closed()
+            self._reader_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._reader_task
+            self._reader_task = None
             self.reader = None
             self.writer = None
+            self.protocol = None
+        if self.transport is not None:
+            assert self.protocol is not None
+            self.transport.close()
+            await self.protocol.closed
+            self.transport = None
+            self.protocol = None
 
-    async def send_command(self, command_name: str):
+    def _on_protocol_closed(self, closed: asyncio.Future):
+        if self._closing or self.protocol is None or closed is not self.protocol.closed:
+            return
+        _LOGGER.warning("Lost connection to %s: %r", self.serial_port, closed.result())
+        if self.reconnect is None:
+            self._discard_outbound()
+            self._close_subscriptions()
+            self._set_state(ConnectionState.DISCONNECTED)
+        elif self._reconnect_task is None:
+            self._set_state(ConnectionState.RECONNECTING)
+            self._reconnect_task = asyncio.create_task(self._reconnect_port())
+        # Otherwise the reconnect task will notice and start again
+
+    async def _reconnect_port(self):
+        """Reconnect task: reopen the port and resync, then resume writing"""
+        assert self.reconnect is not None
+        attempt = 0
+        while True:
+            await self._close_port()
+            await asyncio.sleep(self.reconnect.delay(attempt))
+            attempt += 1
+            try:
+                await self._open_port()
+                assert self.protocol is not None
+                self._in_flight.clear()
+                await self._write(self.codec.encode_command("DISPLAY_REFRESH"))
+                self._command_written()
+            except OSError as e:
+                _LOGGER.debug(
+                    "Reconnect attempt %d to %s failed: %r",
+                    attempt,
+                    self.serial_port,
+                    e,
+                )
+                continue
+            if not self.protocol.closed.done():
+                break
+        _LOGGER.info("Reconnected to %s after %d attempts", self.serial_port, attempt)
+        self._reconnect_task = None
+        self._set_state(ConnectionState.CONNECTED)
+        if self._outbound_ready is not None:
+            self._outbound_ready.set()
+
+    async def _write_outbound(self):
+        """Writer task: write queued frames as fast as the PacingPolicy allows"""
+        assert self._outbound_ready is not None
+        outbound = self._outbound
+        while True:
+            if not outbound or self._state is not ConnectionState.CONNECTED:
+                self._outbound_ready.clear()
+                await self._outbound_ready.wait()
+                continue
+            await self._wait_for_send_slot()
+            if not outbound or self._state is not ConnectionState.CONNECTED:
+                continue
+            frame, future = outbound[0]
+            if future.done():
+                # The sender was cancelled
+                outbound.popleft()
+                continue
+            protocol = self.protocol
+            try:
+                await self._write(frame)
+            except OSError as e:
+                if self.reconnect is not None and protocol is not None:
+                    # Keep the frame and wait for the reconnect to start
+                    _LOGGER.debug("Write failed, will retry: %r", e)
+                    await protocol.closed
+                    continue
+                outbound.popleft()
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            outbound.popleft()
+            self._command_written()
+            if not future.done():
+                future.set_result(None)
+
+    async def _wait_for_send_slot(self):
+        assert self._response_received is not None
+        pacing = self.pacing
+        in_flight = self._in_flight
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            while in_flight and in_flight[0] <= now:
+                in_flight.popleft()
+            delay = self._last_write_time + pacing.min_interval - now
+            if in_flight and len(in_flight) >= pacing.max_in_flight:
+                delay = max(delay, in_flight[0] - now)
+            if delay <= 0:
+                return
+            self._response_received.clear()
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._response_received.wait(), delay)
+
+    def _command_written(self):
+        self._last_write_time = asyncio.get_running_loop().time()
+        self._in_flight.append(self._last_write_time + self.pacing.response_timeout)
+
+    def _discard_outbound(self):
+        if self._outbound:
+            _LOGGER.debug("Discarding %d unsent frames", len(self._outbound))
+        while self._outbound:
+            frame, future = self._outbound.popleft()
+            if not future.done():
+                future.set_exception(
+                    ConnectionError(
+                        "Connection to {} closed before the command was sent".format(
+                            self.serial_port
+                        )
+                    )
+                )
+
+    def _close_subscriptions(self):
+        for subscription in list(self._subscriptions):
+            subscription.close()
+        for event_subscription in list(self._event_subscriptions):
+            event_subscription.close()
+
+    def add_connection_state_callback(
+        self, callback: ConnectionStateCallback
+    ) -> Callable[[], None]:
+        """
+        Register a callback for each ConnectionStateChanged event
+
+        Returns a function that removes the callback again.
+        """
+        self._connection_state_callbacks.append(callback)
+
+        def remove_callback():
+            self._connection_state_callbacks.remove(callback)
+
+        return remove_callback
+
+    def add_message_callback(self, callback: MessageCallback) -> Callable[[], None]:
+        """
+        Register a callback for each decoded message
+
+        Callbacks are called from the reader so they must not block.
+        Returns a function that removes the callback again.
+        """
+        self._message_callbacks.append(callback)
+
+        def remove_callback():
+            self._message_callbacks.remove(callback)
+
+        return remove_callback
+
+    def add_payload_callback(self, callback: PayloadCallback) -> Callable[[], None]:
+        """
+        Register a callback for each valid payload, before it is decoded
+
+        Returns a function that removes the callback again.
+        """
+        self._payload_callbacks.append(callback)
+
+        def remove_callback():
+            self._payload_callbacks.remove(callback)
+
+        return remove_callback
+
+    def subscribe(
+        self,
+        max_depth: int = DEFAULT_SUBSCRIPTION_DEPTH,
+        overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+    ) -> MessageSubscription[AnyMessage]:
+        """
+        Start queueing every message received from now on for a new consumer
+
+        The subscription is registered immediately, so a command sent after
+        subscribing can't have its response missed.   If the connection
+        isn't open then the subscription is returned already closed.
+        See MessageSubscription for max_depth and overflow.
+        """
+        subscription: MessageSubscription[AnyMessage] = MessageSubscription(
+            max_depth,
+            overflow,
+            on_close=self._subscriptions.discard,
+            on_pause=self._pause_reading,
+            on_resume=self._resume_reading,
+        )
+        if self._state is ConnectionState.DISCONNECTED:
+            subscription.close()
+        else:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def _pause_reading(self, subscription: MessageSubscription):
+        if not self._paused_by:
+            _LOGGER.debug("Pausing reading until a subscriber catches up")
+            if self.transport is not None:
+                self.transport.pause_reading()
+            if self._reading_allowed is not None:
+                self._reading_allowed.clear()
+        self._paused_by.add(subscription)
+
+    def _resume_reading(self, subscription: MessageSubscription):
+        self._paused_by.discard(subscription)
+        if not self._paused_by:
+            if self.transport is not None and not self.transport.is_closing():
+                self.transport.resume_reading()
+            if self._reading_allowed is not None:
+                self._reading_allowed.set()
+
+    def _dispatch_message(self, message: AnyMessage):
+        if isinstance(message, FeedbackMessage):
+            self.last_feedback = message
+            if self._in_flight:
+                # Taken as the response to the oldest command
+                self._in_flight.popleft()
+                assert self._response_received is not None
+                self._response_received.set()
+            if self._event_subscriptions:
+                self._track_state(message)
+        for callback in list(self._message_callbacks):
+            callback(message)
+        for subscription in self._subscriptions:
+            subscription.put(message)
+
+    def _track_state(self, message: FeedbackMessage):
+        try:
+            events = self.state_tracker.update(message)
+        except ValueError as e:
+            _LOGGER.warning("Ignoring display that can't be parsed: %r", e)
+            return
+        for subscription in self._event_subscriptions:
+            for event in events:
+                subscription.put(event)
+
+    def last_known(self, field_name: str) -> Any:
+        """
+        The latest value of an AmpDisplayState field, or None if it wasn't shown
+
+        While events() has consumers this is the latest value that
+        state_tracker has seen.   Otherwise it comes from last_feedback,
+        which is only parsed when this is called.
+        """
+        if self._event_subscriptions:
+            return self.state_tracker.last_known(field_name)
+        if self.last_feedback is None:
+            return None
+        try:
+            state = self.last_feedback.display_state
+        except ValueError:
+            return None
+        return getattr(state, field_name)
+
+    def _dispatch_payload(self, payload: bytes):
+        for callback in list(self._payload_callbacks):
+            callback(payload)
+
+    async def _write(self, data: bytes):
         if self.writer is not None:
-            codec = MessageCodec(self.meta)
-            self.writer.write(codec.encode_command(command_name))
+            self.writer.write(data)
             await self.writer.drain()
+        elif self.transport is not None:
+            self.transport.write(data)
+
+    async def _send(self, frame: bytes):
+        """Queue a frame for the writer task and wait until it is written"""
+        if self._state is ConnectionState.DISCONNECTED:
+            return
+        if self._state is ConnectionState.RECONNECTING:
+            assert self.reconnect is not None
+            if len(self._outbound) >= self.reconnect.max_queued:
+                raise ConnectionError(
+                    "Too many commands waiting for {} to reconnect".format(
+                        self.serial_port
+                    )
+                )
+        assert self._outbound_ready is not None
+        future = asyncio.get_running_loop().create_future()
+        self._outbound.append((frame, future))
+        self._outbound_ready.set()
+        await future
+
+    async def send_command(self, command_name: str):
+        await self._send(self.codec.encode_command(command_name))
 
     async def send_volume_direct_command(self, zone: int, volume: int):
-        if self.writer is not None:
-            codec = MessageCodec(self.meta)
-            self.writer.write(codec.encode_volume_direct_command(zone, volume))
-            await self.writer.drain()
+        await self._send(self.codec.encode_volume_direct_command(zone, volume))
+
+    async def read_messages(
+        self,
+        max_depth: int = DEFAULT_SUBSCRIPTION_DEPTH,
+        overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+    ) -> AsyncGenerator[AnyMessage, None]:
+        """
+        Yield each message received until the connection closes
 
-    async def read_messages(self) -> AsyncGenerator[AnyMessage, None]:
-        assert self.reader is not None
-        codec = MessageCodec(self.meta)
-        async for message in codec.decode_message_stream(self.reader):
-            yield message
+        Each call has its own subscription so any number of consumers can
+        read at once.   Breaking out of the loop only ends this subscription.
+        See MessageSubscription for max_depth and overflow.
+        """
+        with self.subscribe(max_depth, overflow) as subscription:
+            async for message in subscription:
+                yield message
+
+    async def events(
+        self, max_depth: int = DEFAULT_SUBSCRIPTION_DEPTH
+    ) -> AsyncGenerator[AmpEvent, None]:
+        """
+        Yield an event for each change to the state of the amp
+
+        Feedback messages that change nothing are skipped (see AmpStateTracker).
+        Every consumer shares state_tracker, which only follows the feedback
+        while there is at least one consumer.   A consumer that starts while
+        others are running first gets an event for everything already known.
+        At most max_depth events are queued; the oldest are dropped after that.
+        """
+        subscription: MessageSubscription[AmpEvent] = MessageSubscription(
+            max_depth, on_close=self._event_subscriptions.discard
+        )
+        if self._state is ConnectionState.DISCONNECTED:
+            subscription.close()
+        elif self._event_subscriptions:
+            for event in self.state_tracker.current_events():
+                subscription.put(event)
+            self._event_subscriptions.add(subscription)
+        else:
+            # Whatever the tracker knew is stale after a gap in tracking
+            self.state_tracker = AmpStateTracker()
+            self._event_subscriptions.add(subscription)
+        with subscription:
+            async for event in subscription:
+                yield event
 
 
 @asynccontextmanager
-async def create_rotel_amp_conn(serial_port: str, meta: RotelModelMeta):
-    conn = RotelAmpConn(serial_port, meta)
+async def create_rotel_amp_conn(
+    serial_port: str,
+    meta: RotelModelMeta,
+    use_protocol: bool = False,
+    resync: bool = False,
+    duplicate_window: Optional[float] = None,
+    reconnect: Optional[ReconnectPolicy] = None,
+    pacing: Optional[PacingPolicy] = None,
+):
+    conn = RotelAmpConn(
+        serial_port, meta, use_protocol, resync, duplicate_window, reconnect, pacing
+    )
     try:
         await conn.open()
         yield conn
@@ -28,12 +28,12 @@ def get_newest_feedback_message(messages):
 
 def get_source_name_from_messages(messages):
     feedback_message = get_newest_feedback_message(messages)
-    return feedback_message.parse_display_lines()["source_name"]
+    return feedback_message.display_state.source_name
 
 
 def get_mute_on_from_messages(messages):
     feedback_message = get_newest_feedback_message(messages)
-    return feedback_message.parse_display_lines()["mute_on"]
+    return feedback_message.display_state.mute_on
 
 
 async def discover_source_aliases(conn: RotelAmpConn) -> Dict[str, str]:
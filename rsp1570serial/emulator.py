@@ -16,7 +16,7 @@ from rsp1570serial.message_types import (
     MSGTYPE_ZONE_4_VOLUME_DIRECT_COMMANDS,
 )
 from rsp1570serial.messages import CommandMessage, MessageCodec
-from rsp1570serial.protocol import encode_payload
+from rsp1570serial.protocol import BUFFERED_READ_SIZE, encode_payload
 from rsp1570serial.rotel_model_meta import (
     ROTEL_MODELS,
     RSP1572_MODEL_ID,
@@ -383,7 +383,7 @@ class CommandHandler:
 
     async def handle_command_stream(self, reader):
         codec = MessageCodec(self._device._meta)
-        async for message in codec.decode_message_stream(reader):
+        async for message in codec.decode_message_stream(reader, BUFFERED_READ_SIZE):
             if isinstance(message, CommandMessage):
                 await self.handle_command(message)
             else:
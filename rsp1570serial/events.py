@@ -0,0 +1,160 @@
+"""
+Typed events describing what changed on the amp
+
+AmpStateTracker compares each FeedbackMessage with the ones before it and
+returns an event for each thing that changed.   A message that changes
+nothing (e.g. a mute blink or a repeated DISPLAY_REFRESH) produces no events.
+
+Display line 2 only shows one of the record source, zone sources and zone
+volumes at a time so these are reported when they are shown with a new
+value.   They are never reported as having disappeared.
+
+ConnectionStateChanged is reported by RotelAmpConn rather than
+AmpStateTracker (see RotelAmpConn.add_connection_state_callback).
+"""
+
+from dataclasses import dataclass
+from enum import Enum
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from rsp1570serial.icons import mask_to_icons
+from rsp1570serial.messages import AmpDisplayState, FeedbackMessage
+
+
+class AmpEvent:
+    """Base class for events"""
+
+
+@dataclass(frozen=True)
+class PowerChanged(AmpEvent):
+    is_on: bool
+
+
+@dataclass(frozen=True)
+class SourceChanged(AmpEvent):
+    source_name: str
+
+
+@dataclass(frozen=True)
+class VolumeChanged(AmpEvent):
+    volume: int
+
+
+@dataclass(frozen=True)
+class MuteChanged(AmpEvent):
+    mute_on: bool
+
+
+@dataclass(frozen=True)
+class PartyModeChanged(AmpEvent):
+    party_mode_on: bool
+
+
+@dataclass(frozen=True)
+class RecordSourceChanged(AmpEvent):
+    source_name: str
+
+
+@dataclass(frozen=True)
+class ZoneSourceChanged(AmpEvent):
+    zone: int
+    source_name: str
+
+
+@dataclass(frozen=True)
+class ZoneVolumeChanged(AmpEvent):
+    zone: int
+    volume: int
+
+
+@dataclass(frozen=True)
+class IconsChanged(AmpEvent):
+    icon_mask: int
+    previous_icon_mask: int
+
+    @property
+    def icons_turned_on(self) -> List[str]:
+        return mask_to_icons(self.icon_mask & ~self.previous_icon_mask)
+
+    @property
+    def icons_turned_off(self) -> List[str]:
+        return mask_to_icons(self.previous_icon_mask & ~self.icon_mask)
+
+
+class ConnectionState(Enum):
+    # Not open, or the port was lost and won't be reopened
+    DISCONNECTED = "disconnected"
+    CONNECTED = "connected"
+    # The port was lost and is being reopened
+    RECONNECTING = "reconnecting"
+
+
+@dataclass(frozen=True)
+class ConnectionStateChanged(AmpEvent):
+    state: ConnectionState
+
+
+# AmpDisplayState field and the event to report when it changes
+_FIELD_EVENTS: Tuple[Tuple[str, Callable[[Any], AmpEvent]], ...] = (
+    ("is_on", PowerChanged),
+    ("source_name", SourceChanged),
+    ("volume", VolumeChanged),
+    ("mute_on", MuteChanged),
+    ("party_mode_on", PartyModeChanged),
+    ("rec_source", RecordSourceChanged),
+    ("zone2_source", partial(ZoneSourceChanged, 2)),
+    ("zone2_volume", partial(ZoneVolumeChanged, 2)),
+    ("zone3_source", partial(ZoneSourceChanged, 3)),
+    ("zone3_volume", partial(ZoneVolumeChanged, 3)),
+    ("zone4_source", partial(ZoneSourceChanged, 4)),
+    ("zone4_volume", partial(ZoneVolumeChanged, 4)),
+)
+
+
+class AmpStateTracker:
+    """
+    Turn a sequence of FeedbackMessages into change events
+
+    The first message reports everything that it shows.
+    """
+
+    def __init__(self):
+        self.state: Optional[AmpDisplayState] = None
+        self.icon_mask: Optional[int] = None
+        # Latest value of each field, ignoring messages where it wasn't shown
+        self._known: Dict[str, Any] = {}
+
+    def update(self, message: FeedbackMessage) -> List[AmpEvent]:
+        state = message.display_state
+        icon_mask = message.icon_mask
+        if state == self.state and icon_mask == self.icon_mask:
+            return []
+        events: List[AmpEvent] = []
+        known = self._known
+        for field_name, make_event in _FIELD_EVENTS:
+            value = getattr(state, field_name)
+            if value is not None and known.get(field_name) != value:
+                known[field_name] = value
+                events.append(make_event(value))
+        if icon_mask != self.icon_mask:
+            previous_icon_mask = 0 if self.icon_mask is None else self.icon_mask
+            events.append(IconsChanged(icon_mask, previous_icon_mask))
+        self.state = state
+        self.icon_mask = icon_mask
+        return events
+
+    def last_known(self, field_name: str) -> Any:
+        """The latest value shown for an AmpDisplayState field, or None"""
+        return self._known.get(field_name)
+
+    def current_events(self) -> List[AmpEvent]:
+        """The events that the first message would report for what is known"""
+        events: List[AmpEvent] = [
+            make_event(self._known[field_name])
+            for field_name, make_event in _FIELD_EVENTS
+            if field_name in self._known
+        ]
+        if self.icon_mask is not None:
+            events.append(IconsChanged(self.icon_mask, 0))
+        return events
@@ -1,9 +1,18 @@
 """
 Module that contains all icon definitions
 and icon/flag mappings
-Not much of this is used yet but it may be handy in future
+
+The 5 flag bytes can be treated as a single 40 bit mask, with flag byte 0
+in the lowest 8 bits.   DisplayIcon names each bit so that questions like
+"which speakers are active" or "which icons changed" are integer operations.
+Conversion to icon codes is done with per-byte lookup tables.
 """
 
+from enum import IntFlag
+from typing import Dict, List, Tuple
+
+FLAG_BYTE_COUNT = 5
+
 
 class DisplayIconDefinition:
     def __init__(self, name, category, friendly_name, icon, flag_index, flag):
@@ -13,6 +22,7 @@ class DisplayIconDefinition:
         self.icon = icon
         self.flag_index = flag_index
         self.flag = flag
+        self.mask = flag << (8 * flag_index)
 
 
 DISPLAY_ICON_DEFINITIONS = [
@@ -150,13 +160,112 @@ DISPLAY_ICON_DEFINITIONS = [
 
 DISPLAY_ICON_DEFINITIONS_BY_ICON = {d.icon: d for d in DISPLAY_ICON_DEFINITIONS}
 
+
+class DisplayIcon(IntFlag):
+    """
+    One bit per icon in the 40 bit mask of the flag bytes
+
+    The member names are the definition names without the "rsp1570_" prefix.
+    """
+
+    INPUT_ANALOG = 1 << 0
+    INPUT_5 = 1 << 1
+    INPUT_4 = 1 << 2
+    INPUT_3 = 1 << 3
+    INPUT_2 = 1 << 4
+    INPUT_1 = 1 << 5
+    INPUT_COAXIAL = 1 << 6
+    INPUT_OPTICAL = 1 << 7
+    SOUND_MODE_X = 1 << 8
+    SOUND_MODE_II = 1 << 9
+    INPUT_HDMI = 1 << 10
+    SOUND_MODE_EX = 1 << 11
+    SOUND_MODE_ES = 1 << 12
+    SOUND_MODE_DTS = 1 << 13
+    SOUND_MODE_PRO_LOGIC = 1 << 14
+    SOUND_MODE_DOLBY_DIGITAL = 1 << 15
+    STATE_DISPLAY_MODE0 = 1 << 16
+    STATE_DISPLAY_MODE1 = 1 << 17
+    STATE_ZONE2 = 1 << 18
+    STATE_STANDBY_LED = 1 << 19
+    SPEAKER_CENTER_BACK = 1 << 24
+    STATE_ZONE4 = 1 << 25
+    STATE_ZONE3 = 1 << 26
+    MISC_LT = 1 << 27
+    MISC_GT = 1 << 28
+    SOUND_MODE_71 = 1 << 29
+    SOUND_MODE_51 = 1 << 30
+    STATE_ZONE = 1 << 31
+    SPEAKER_CENTER_BACK_LEFT = 1 << 32
+    SPEAKER_CENTER_BACK_RIGHT = 1 << 33
+    SPEAKER_SUBWOOFER = 1 << 34
+    SPEAKER_SURROUND_RIGHT = 1 << 35
+    SPEAKER_SURROUND_LEFT = 1 << 36
+    SPEAKER_FRONT_RIGHT = 1 << 37
+    SPEAKER_CENTER = 1 << 38
+    SPEAKER_FRONT_LEFT = 1 << 39
+
+
+def _category_masks() -> Dict[str, int]:
+    masks: Dict[str, int] = {}
+    for d in DISPLAY_ICON_DEFINITIONS:
+        masks[d.category] = masks.get(d.category, 0) | d.mask
+    return masks
+
+
+# Mask of all of the icons in each category, e.g. "speaker_icons"
+CATEGORY_MASKS = _category_masks()
+
+
+def _icon_tables() -> List[Tuple[Tuple[str, ...], ...]]:
+    tables = []
+    for flag_index in range(FLAG_BYTE_COUNT):
+        definitions = [
+            d for d in DISPLAY_ICON_DEFINITIONS if d.flag_index == flag_index
+        ]
+        tables.append(
+            tuple(
+                tuple(d.icon for d in definitions if value & d.flag)
+                for value in range(256)
+            )
+        )
+    return tables
+
+
+# For each flag byte, the icon codes that are on for each of the 256 values
+_ICON_TABLES = _icon_tables()
+
+
+def flags_to_mask(flags) -> int:
+    """Convert the 5 flag bytes into a 40 bit mask of DisplayIcon bits"""
+    return int.from_bytes(flags, "little")
+
+
+def mask_to_flags(mask: int) -> bytes:
+    return mask.to_bytes(FLAG_BYTE_COUNT, "little")
+
+
+def mask_to_icons(mask: int) -> List[str]:
+    """
+    Return the codes of the icons that are on in a mask
+
+    The codes are in DISPLAY_ICON_DEFINITIONS order.
+    """
+    icons: List[str] = []
+    for table in _ICON_TABLES:
+        if mask & 0xFF:
+            icons.extend(table[mask & 0xFF])
+        mask >>= 8
+    return icons
+
+
 # DISPLAY_ICON_DEFINITIONS_BY_NAME = {d.name: d for d in DISPLAY_ICON_DEFINITIONS}
 
 
 def flags_to_icons(flags):
-    icons = {}
-    for d in DISPLAY_ICON_DEFINITIONS:
-        icons[d.icon] = bool(flags[d.flag_index] & d.flag)
+    icons = dict.fromkeys(DISPLAY_ICON_DEFINITIONS_BY_ICON, False)
+    for icon in mask_to_icons(flags_to_mask(flags)):
+        icons[icon] = True
     return icons
 
 
@@ -173,6 +282,6 @@ def icon_dict_to_flags(icon_dict):
 
 
 def icons_that_are_on(icon_dict):
-    # TODO: Consistent order
+    """Return the codes of the icons that are on, in icon_dict order"""
     return [i for (i, v) in icon_dict.items() if v]
 
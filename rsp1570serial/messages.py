@@ -1,8 +1,22 @@
 import logging
-from dataclasses import dataclass
-from typing import AsyncGenerator, Callable, Dict, List, Union
+import re
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from types import MappingProxyType
+from typing import (
+    AsyncGenerator,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
-from rsp1570serial.icons import flags_to_icons, icons_that_are_on
+from rsp1570serial.icons import flags_to_icons, flags_to_mask, mask_to_icons
 from rsp1570serial.message_types import (
     MSGTYPE_FEEDBACK_STRING,
     MSGTYPE_MAIN_ZONE_COMMANDS,
@@ -23,6 +37,9 @@ from rsp1570serial.message_types import (
 )
 from rsp1570serial.protocol import (
     AnyAsyncReader,
+    DuplicatePayloadFilter,
+    ProtocolStats,
+    TimestampedPayload,
     decode_protocol_stream,
     encode_payload,
 )
@@ -63,26 +80,202 @@ SMART_DISPLAY_LINE_MAPPING: Dict[int, bytes] = {
     0x00: b"\x20",
 }
 
+# SMART_DISPLAY_LINE_MAPPING as a str.translate table for lines decoded as latin-1
+_SMART_DISPLAY_LINE_TABLE = str.maketrans(
+    {chr(i): mapped.decode("utf-8") for i, mapped in SMART_DISPLAY_LINE_MAPPING.items()}
+)
+
+# Bytes that are passed through to the UTF-8 decoder rather than mapped
+_UNMAPPED_HIGH_BYTES_RE = re.compile(b"[\x8d-\xff]")
+
+# Number of distinct smart display lines cached by decode_smart_display_line
+SMART_DISPLAY_LINE_CACHE_SIZE = 256
+
 
 class RotelMessageError(Exception):
     pass
 
 
-class FeedbackMessage:
-    def __init__(self, line1, line2, flags):
-        self.lines = [line1, line2]
+_MessageT = TypeVar("_MessageT", bound="RotelMessage")
+
+
+class RotelMessage:
+    """
+    Base class for decoded messages
+
+    start_time and end_time are copied from the TimestampedPayload that the
+    message was decoded from, when there was one, so that the latency from
+    the wire to the consumer is time.monotonic() - end_time.
+    Messages use __slots__ to keep them small and must not be modified
+    once decoded because MessageCodec shares their state between copies.
+    """
+
+    __slots__ = ("start_time", "end_time")
+
+    # Names of all of the slots of the class, set for each subclass
+    _all_slots: Tuple[str, ...] = __slots__
+
+    def __init__(self):
+        self.start_time: Optional[float] = None
+        self.end_time: Optional[float] = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._all_slots = tuple(
+            name for klass in cls.__mro__ for name in getattr(klass, "__slots__", ())
+        )
+
+    def with_timestamps(
+        self: _MessageT, start_time: Optional[float], end_time: Optional[float]
+    ) -> _MessageT:
+        """Return a shallow copy of the message with different timestamps"""
+        cls = type(self)
+        message = cls.__new__(cls)
+        for name in cls._all_slots:
+            setattr(message, name, getattr(self, name))
+        message.start_time = start_time
+        message.end_time = end_time
+        return message
+
+
+@dataclass(frozen=True)
+class AmpDisplayState:
+    """
+    What can be inferred about the state of the amp from its display
+
+    Immutable and hashable so states can be compared, de-duplicated and
+    used as dict keys.
+    """
+
+    __slots__ = (
+        "is_on",
+        "source_name",
+        "volume",
+        "mute_on",
+        "party_mode_on",
+        "info",
+        "rec_source",
+        "zone2_source",
+        "zone2_volume",
+        "zone3_source",
+        "zone3_volume",
+        "zone4_source",
+        "zone4_volume",
+    )
+
+    is_on: Optional[bool]
+    source_name: Optional[str]
+    volume: Optional[int]
+    mute_on: Optional[bool]
+    party_mode_on: Optional[bool]
+    info: Optional[str]
+    rec_source: Optional[str]
+    zone2_source: Optional[str]
+    zone2_volume: Optional[int]
+    zone3_source: Optional[str]
+    zone3_volume: Optional[int]
+    zone4_source: Optional[str]
+    zone4_volume: Optional[int]
+
+    def __reduce__(self):
+        # Frozen slotted instances can't be pickled (e.g. by capture) otherwise
+        return (type(self), tuple(getattr(self, name) for name in self.__slots__))
+
+
+class _FeedbackDecoding:
+    """
+    The parts of a FeedbackMessage decoded so far
+
+    Shared by every copy of a cached message (see MessageCodec) so that
+    whichever copy decodes a part first decodes it for all of them.
+    """
+
+    __slots__ = ("lines", "flags", "icons", "display_state")
+
+    def __init__(
+        self,
+        lines: Optional[Tuple[str, str]] = None,
+        flags: Optional[bytes] = None,
+    ):
+        self.lines = lines
         self.flags = flags
-        self.icons = flags_to_icons(flags)
+        self.icons: Optional[Dict[str, bool]] = None
+        self.display_state: Optional[AmpDisplayState] = None
+
+
+class FeedbackMessage(RotelMessage):
+    """
+    The contents of the front panel display
+
+    A message decoded from the wire keeps the raw data (two display lines
+    then the icon flags) and only decodes the lines, icons and display state
+    when they are first accessed.   The results are cached.
+    """
+
+    __slots__ = ("_data", "_decoded")
+
+    def __init__(self, line1, line2, flags):
+        super().__init__()
+        self._data: Optional[bytes] = None
+        self._decoded = _FeedbackDecoding((line1, line2), flags)
+
+    @classmethod
+    def from_data(cls, data: bytes) -> "FeedbackMessage":
+        message = cls.__new__(cls)
+        RotelMessage.__init__(message)
+        message._data = data
+        message._decoded = _FeedbackDecoding()
+        return message
+
+    @property
+    def data(self) -> bytes:
+        """The raw message data"""
+        if self._data is None:
+            line_bytes = "".join(self.lines).encode(encoding="ascii")
+            self._data = line_bytes + bytes(self.flags)
+        return self._data
+
+    @property
+    def lines(self) -> Tuple[str, str]:
+        decoded = self._decoded
+        if decoded.lines is None:
+            data = self.data  # The II is char 0x19
+            decoded.lines = (
+                data[0:21].decode(encoding="ascii"),
+                data[21:42].decode(encoding="ascii"),
+            )
+        return decoded.lines
+
+    @property
+    def flags(self):
+        decoded = self._decoded
+        if decoded.flags is None:
+            decoded.flags = self.data[42:47]
+        return decoded.flags
+
+    @property
+    def icons(self) -> Mapping[str, bool]:
+        decoded = self._decoded
+        if decoded.icons is None:
+            decoded.icons = flags_to_icons(self.flags)
+        # Read-only because cached messages share it
+        return MappingProxyType(decoded.icons)
+
+    @property
+    def icon_mask(self) -> int:
+        """The flags as a mask of DisplayIcon bits"""
+        return flags_to_mask(self.flags)
 
     def icons_that_are_on(self):
-        return icons_that_are_on(self.icons)
+        return mask_to_icons(self.icon_mask)
 
     def log(self, level=logging.INFO):
         _LOGGER.log(level, "Display line 1: '%s'", self.lines[0])
         _LOGGER.log(level, "Display line 2: '%s'", self.lines[1])
         _LOGGER.log(level, "Icons: %r", self.icons_that_are_on())
 
-    def parse_display_lines(self):
+    @property
+    def display_state(self) -> AmpDisplayState:
         """
         Parse the display lines and return as much
         as we can infer about the state of the amp.
@@ -93,7 +286,19 @@ class FeedbackMessage:
         appears.  It is copied out verbatim in the 'info' field and
         it is probably safest to just display that to the user
         and leave it at that.
+        The state is only parsed once per message.
         """
+        decoded = self._decoded
+        if decoded.display_state is None:
+            decoded.display_state = self._parse_display_lines()
+        return decoded.display_state
+
+    def parse_display_lines(self):
+        """Return display_state as a new dict"""
+        state = self.display_state
+        return {name: getattr(state, name) for name in AmpDisplayState.__slots__}
+
+    def _parse_display_lines(self) -> AmpDisplayState:
         is_on = None
         source_name = None
         volume = None
@@ -155,25 +360,28 @@ class FeedbackMessage:
             elif line1[:14] == "  ZONE4 VOL   ":
                 zone4_volume = int(line1[14:16])
 
-        return {
-            "is_on": is_on,
-            "source_name": source_name,
-            "volume": volume,
-            "mute_on": mute_on,
-            "party_mode_on": party_mode_on,
-            "info": info,
-            "rec_source": rec_source,
-            "zone2_source": zone2_source,
-            "zone2_volume": zone2_volume,
-            "zone3_source": zone3_source,
-            "zone3_volume": zone3_volume,
-            "zone4_source": zone4_source,
-            "zone4_volume": zone4_volume,
-        }
-
-
-class TriggerMessage:
+        return AmpDisplayState(
+            is_on=is_on,
+            source_name=source_name,
+            volume=volume,
+            mute_on=mute_on,
+            party_mode_on=party_mode_on,
+            info=info,
+            rec_source=rec_source,
+            zone2_source=zone2_source,
+            zone2_volume=zone2_volume,
+            zone3_source=zone3_source,
+            zone3_volume=zone3_volume,
+            zone4_source=zone4_source,
+            zone4_volume=zone4_volume,
+        )
+
+
+class TriggerMessage(RotelMessage):
+    __slots__ = ("flags",)
+
     def __init__(self, flags):
+        super().__init__()
         self.flags = flags
 
     def log(self, level=logging.INFO):
@@ -201,8 +409,11 @@ class TriggerMessage:
         return out
 
 
-class CommandMessage:
+class CommandMessage(RotelMessage):
+    __slots__ = ("message_type", "key")
+
     def __init__(self, message_type: int, key: bytes):
+        super().__init__()
         self.message_type = message_type
         self.key = key
 
@@ -214,9 +425,12 @@ class CommandMessage:
         )
 
 
-class SmartDisplayMessage:
+class SmartDisplayMessage(RotelMessage):
+    __slots__ = ("lines", "start")
+
     def __init__(self, lines, start):
-        self.lines = lines
+        super().__init__()
+        self.lines: Tuple[str, ...] = tuple(lines)
         self.start = start
 
     def log(self, level=logging.INFO):
@@ -235,14 +449,7 @@ AnyMessage = Union[
 
 def feedback_message_handler(message_type: int, data: bytes) -> FeedbackMessage:
     assert message_type == MSGTYPE_FEEDBACK_STRING
-    display_line1_bytes = data[0:21]  # The II is char 0x19
-    display_line2_bytes = data[21:42]
-    flags = data[42:47]
-    return FeedbackMessage(
-        display_line1_bytes.decode(encoding="ascii"),
-        display_line2_bytes.decode(encoding="ascii"),
-        flags,
-    )
+    return FeedbackMessage.from_data(data)
 
 
 # OFF Data was: bytearray(b'\x00\x00\x00\x00\x00')
@@ -262,8 +469,20 @@ def decode_smart_display_line(line_bytes: bytes) -> str:
     Decode a smart display line
 
     Convert special characters to appropriate unicode equivalents
-    Note - this should really be a codec but it works OK
+    Most lines are ASCII plus special characters and are converted with a
+    translate table.   Any other bytes are passed on to the UTF-8 decoder.
+    Results are cached because most lines don't change from one message
+    to the next.
     """
+    return _decode_smart_display_line(bytes(line_bytes))
+
+
+@lru_cache(maxsize=SMART_DISPLAY_LINE_CACHE_SIZE)
+def _decode_smart_display_line(line_bytes: bytes) -> str:
+    if _UNMAPPED_HIGH_BYTES_RE.search(line_bytes) is None:
+        line = line_bytes.decode("latin-1").translate(_SMART_DISPLAY_LINE_TABLE)
+        return line.rstrip()
+
     mapped_line_bytes = bytearray()
     for i in line_bytes:
         mapped_line_bytes.extend(
@@ -327,49 +546,190 @@ def get_volume_direct_message_type(zone: int) -> int:
         raise ValueError("Invalid zone: {}".format(zone))
 
 
-def get_message_handler(message_type: int) -> Callable[[int, bytes], AnyMessage]:
-    message_handlers: Dict[int, Callable[[int, bytes], AnyMessage]] = {
-        MSGTYPE_FEEDBACK_STRING: feedback_message_handler,
-        MSGTYPE_TRIGGER_STATUS_STRING: trigger_message_handler,
-        MSGTYPE_PRIMARY_COMMANDS: command_message_handler,
-        MSGTYPE_PRIMARY_KEY_RELEASED_COMMANDS: command_message_handler,
-        MSGTYPE_MAIN_ZONE_COMMANDS: command_message_handler,
-        MSGTYPE_RECORD_SOURCE_COMMANDS: command_message_handler,
-        MSGTYPE_ZONE_2_COMMANDS: command_message_handler,
-        MSGTYPE_ZONE_3_COMMANDS: command_message_handler,
-        MSGTYPE_ZONE_4_COMMANDS: command_message_handler,
-        MSGTYPE_VOLUME_DIRECT_COMMANDS: command_message_handler,
-        MSGTYPE_ZONE_2_VOLUME_DIRECT_COMMANDS: command_message_handler,
-        MSGTYPE_ZONE_3_VOLUME_DIRECT_COMMANDS: command_message_handler,
-        MSGTYPE_ZONE_4_VOLUME_DIRECT_COMMANDS: command_message_handler,
-        MSGTYPE_TRIGGER_DIRECT_COMMANDS: command_message_handler,
-        MSGTYPE_TRIGGER_SMART_DISPLAY_STRING_1: smart_display_string_1_handler,
-        MSGTYPE_TRIGGER_SMART_DISPLAY_STRING_2: smart_display_string_2_handler,
-    }
-    if message_type in message_handlers:
-        return message_handlers[message_type]
-    else:
+MessageHandler = Callable[[int, bytes], AnyMessage]
+
+# Handler for each message type.   Extend with register_message_handler.
+MESSAGE_HANDLERS: Dict[int, MessageHandler] = {
+    MSGTYPE_FEEDBACK_STRING: feedback_message_handler,
+    MSGTYPE_TRIGGER_STATUS_STRING: trigger_message_handler,
+    MSGTYPE_PRIMARY_COMMANDS: command_message_handler,
+    MSGTYPE_PRIMARY_KEY_RELEASED_COMMANDS: command_message_handler,
+    MSGTYPE_MAIN_ZONE_COMMANDS: command_message_handler,
+    MSGTYPE_RECORD_SOURCE_COMMANDS: command_message_handler,
+    MSGTYPE_ZONE_2_COMMANDS: command_message_handler,
+    MSGTYPE_ZONE_3_COMMANDS: command_message_handler,
+    MSGTYPE_ZONE_4_COMMANDS: command_message_handler,
+    MSGTYPE_VOLUME_DIRECT_COMMANDS: command_message_handler,
+    MSGTYPE_ZONE_2_VOLUME_DIRECT_COMMANDS: command_message_handler,
+    MSGTYPE_ZONE_3_VOLUME_DIRECT_COMMANDS: command_message_handler,
+    MSGTYPE_ZONE_4_VOLUME_DIRECT_COMMANDS: command_message_handler,
+    MSGTYPE_TRIGGER_DIRECT_COMMANDS: command_message_handler,
+    MSGTYPE_TRIGGER_SMART_DISPLAY_STRING_1: smart_display_string_1_handler,
+    MSGTYPE_TRIGGER_SMART_DISPLAY_STRING_2: smart_display_string_2_handler,
+}
+
+
+def register_message_handler(message_type: int, handler: MessageHandler):
+    """
+    Add or replace the handler for a message type
+
+    This affects every MessageCodec that uses the default handlers.
+    """
+    MESSAGE_HANDLERS[message_type] = handler
+
+
+def get_message_handler(message_type: int) -> MessageHandler:
+    message_handler = MESSAGE_HANDLERS.get(message_type)
+    if message_handler is None:
         raise RotelMessageError("Unknown message type byte {:X}".format(message_type))
+    return message_handler
+
+
+VOLUME_DIRECT_ZONES = (1, 2, 3, 4)
+
+# Default number of distinct payloads cached by a MessageCodec
+DECODE_CACHE_SIZE = 64
+
+
+@dataclass
+class CodecStats:
+    """Health counters for a MessageCodec.   Safe to read at any time."""
+
+    messages_by_type: Counter = field(default_factory=Counter)
+    unknown_message_types: int = 0
+    device_id_mismatches: int = 0
+    duplicates_suppressed: int = 0
+    decode_cache_hits: int = 0
 
 
 @dataclass
 class MessageCodec:
+    """
+    Encode commands and decode messages for a particular model
+
+    The fully encoded frame for every command and for every volume direct
+    command is built once when the codec is constructed so that encoding
+    is just a lookup.   Create one codec and reuse it.
+
+    Counters for decoded messages are kept in stats and counters for the
+    protocol streams decoded by decode_message_stream in protocol_stats.
+
+    The most recently decoded decode_cache_size distinct payloads are kept
+    in an LRU cache so a repeated payload (and the amp repeats itself a lot)
+    is decoded with one lookup.   Each call still returns a new message with
+    its own timestamps but everything else is shared, including whatever
+    any of the messages decodes lazily later on.   Set decode_cache_size to
+    0 to disable the cache.
+
+    Messages are decoded by message_handlers, which defaults to the shared
+    MESSAGE_HANDLERS.   Pass a mapping of your own to handle extra message
+    types for one codec only.
+    """
+
     meta: RotelModelMeta
+    decode_cache_size: int = DECODE_CACHE_SIZE
+    message_handlers: Mapping[int, MessageHandler] = field(
+        default_factory=lambda: MESSAGE_HANDLERS, repr=False
+    )
+    _command_frames: Mapping[str, bytes] = field(init=False, repr=False, compare=False)
+    _volume_direct_frames: Mapping[Tuple[int, int], bytes] = field(
+        init=False, repr=False, compare=False
+    )
+    stats: CodecStats = field(
+        default_factory=CodecStats, init=False, repr=False, compare=False
+    )
+    protocol_stats: ProtocolStats = field(
+        default_factory=ProtocolStats, init=False, repr=False, compare=False
+    )
+    _decode_cache: "OrderedDict[bytes, AnyMessage]" = field(
+        default_factory=OrderedDict, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self):
+        device_id = self.meta.device_id
+        self._command_frames = MappingProxyType(
+            {
+                command_name: encode_payload([device_id, message_type, key])
+                for command_name, [message_type, key] in self.meta.messages.items()
+            }
+        )
+        self._volume_direct_frames = MappingProxyType(
+            {
+                (zone, volume): encode_payload(
+                    [device_id, get_volume_direct_message_type(zone), volume]
+                )
+                for zone in VOLUME_DIRECT_ZONES
+                for volume in range(self.meta.min_volume, self.meta.max_volume + 1)
+            }
+        )
 
     def encode_command(self, command_name: str) -> bytes:
-        [message_type, key] = self.meta.messages[command_name]
-        return encode_payload([self.meta.device_id, message_type, key])
+        return self._command_frames[command_name]
 
     def encode_volume_direct_command(self, zone: int, volume: int) -> bytes:
-        message_type = get_volume_direct_message_type(zone)
-
-        if volume < self.meta.min_volume or volume > self.meta.max_volume:
-            raise ValueError("Volume out of range: {}".format(volume))
+        frame = self._volume_direct_frames.get((zone, volume))
+        if frame is not None:
+            return frame
 
-        return encode_payload([self.meta.device_id, message_type, volume])
+        get_volume_direct_message_type(zone)  # Raises ValueError for invalid zone
+        raise ValueError("Volume out of range: {}".format(volume))
 
     def decode_message(self, payload: bytes) -> AnyMessage:
+        message = self._decode_message(payload)
+        if message is None:
+            raise RotelMessageError("Unknown message type byte {:X}".format(payload[1]))
+        return message
+
+    def try_decode_message(self, payload: bytes) -> Optional[AnyMessage]:
+        """
+        Decode the payload, returning None if it can't be decoded
+
+        A payload of an unknown message type is just counted in stats.
+        Any other error is logged.
+        """
+        try:
+            return self._decode_message(payload)
+        except RotelMessageError as e:
+            logging.error(
+                "Discarding payload because error occurred in decode_message.  Payload: %r",
+                payload,
+                exc_info=e,
+            )
+            return None
+
+    def _decode_message(self, payload: bytes) -> Optional[AnyMessage]:
+        """Decode the payload or return None if the message type is unknown"""
+        start_time = end_time = None
+        if isinstance(payload, TimestampedPayload):
+            start_time = payload.start_time
+            end_time = payload.end_time
+        elif not isinstance(payload, bytes):
+            # e.g. a memoryview from decode_protocol_buffer
+            payload = bytes(payload)
+
+        message = None
+        if self.decode_cache_size > 0:
+            message = self._decode_cache.get(payload)
+        if message is not None:
+            self._decode_cache.move_to_end(payload)
+            self.stats.decode_cache_hits += 1
+            self.stats.messages_by_type[payload[1]] += 1
+            return message.with_timestamps(start_time, end_time)
+
+        message = self._decode_uncached_message(payload)
+        if message is None:
+            return None
+        message.start_time = start_time
+        message.end_time = end_time
+        if self.decode_cache_size > 0:
+            self._decode_cache[payload] = message
+            if len(self._decode_cache) > self.decode_cache_size:
+                self._decode_cache.popitem(last=False)
+        return message
+
+    def _decode_uncached_message(self, payload: bytes) -> Optional[AnyMessage]:
         if payload[0] != self.meta.device_id:
+            self.stats.device_id_mismatches += 1
             raise RotelMessageError(
                 "Didn't get expected Device ID byte ({:02X} != {:02X}) while processing {!r}".format(
                     payload[0],
@@ -379,21 +739,47 @@ class MessageCodec:
             )
 
         message_type = payload[1]
-        data = payload[2:]
-        message_handler = get_message_handler(message_type)
-        return message_handler(message_type, data)
+        message_handler = self.message_handlers.get(message_type)
+        if message_handler is None:
+            self.stats.unknown_message_types += 1
+            _LOGGER.debug(
+                "Skipping message of unknown type %02X: %r", message_type, payload
+            )
+            return None
+        self.stats.messages_by_type[message_type] += 1
+        return message_handler(message_type, payload[2:])
+
+    def is_duplicate(
+        self, payload: bytes, duplicate_filter: Optional[DuplicatePayloadFilter]
+    ) -> bool:
+        """Check payload against duplicate_filter (if any), counting duplicates"""
+        if duplicate_filter is None or not duplicate_filter.is_duplicate(payload):
+            return False
+        self.stats.duplicates_suppressed += 1
+        return True
 
     async def decode_message_stream(
-        self, ser: AnyAsyncReader
+        self,
+        ser: AnyAsyncReader,
+        read_size: int = 1,
+        resync: bool = False,
+        duplicate_window: Optional[float] = None,
     ) -> AsyncGenerator[AnyMessage, None]:
-        async for payload in decode_protocol_stream(ser):
-            try:
-                message = self.decode_message(payload)
-            except RotelMessageError as e:
-                logging.error(
-                    "Discarding payload because error occurred in decode_message.  Payload: %r",
-                    payload,
-                    exc_info=e,
-                )
-            else:
+        """
+        Decode messages from a reader until EOF
+
+        If duplicate_window is set then a payload that is identical to one
+        yielded within the last duplicate_window seconds is skipped without
+        being decoded (see DuplicatePayloadFilter).
+        """
+        duplicate_filter = None
+        if duplicate_window is not None:
+            duplicate_filter = DuplicatePayloadFilter(duplicate_window)
+        async for payload in decode_protocol_stream(
+            ser, read_size, resync, self.protocol_stats
+        ):
+            if self.is_duplicate(payload, duplicate_filter):
+                continue
+            message = self.try_decode_message(payload)
+            if message is not None:
                 yield message
@@ -1,22 +1,31 @@
 import asyncio
 import logging
-from typing import List
+import re
+from contextlib import suppress
+from typing import Any, Callable, List, Optional
 
-from .connection import RotelAmpConn
-from .messages import AnyMessage
+from .connection import MessageSubscription, RotelAmpConn
+from .messages import AnyMessage, FeedbackMessage
 
 _LOGGER = logging.getLogger(__name__)
 
 POWER_ON_TIME_WINDOW = 5.0
 DEFAULT_TIME_WINDOW = 1.0
 
+ConfirmationPredicate = Callable[[FeedbackMessage], bool]
+
+_VOLUME_LEVEL_RE = re.compile(r"VOLUME_(\d+)$")
+
+
+def _default_time_window(command_code: str) -> float:
+    return POWER_ON_TIME_WINDOW if "POWER" in command_code else DEFAULT_TIME_WINDOW
+
 
 async def process_command(conn: RotelAmpConn, command_code: str) -> List[AnyMessage]:
     """Send a command and collect the response messages that arrive within a short time window"""
-    time_window = (
-        POWER_ON_TIME_WINDOW if "POWER" in command_code else DEFAULT_TIME_WINDOW
+    return await process_command_ll(
+        conn, command_code, _default_time_window(command_code)
     )
-    return await process_command_ll(conn, command_code, time_window)
 
 
 async def process_command_ll(
@@ -31,26 +40,136 @@ async def process_command_ll(
     Recommended time_windows are provided as class constants
     """
     messages: List[AnyMessage] = []
+    loop = asyncio.get_running_loop()
 
-    async def collect_messages(conn: RotelAmpConn):
-        _LOGGER.debug("Started collecting messages")
-        try:
-            async for message in conn.read_messages():
-                _LOGGER.debug("Message received")
-                message.log(logging.DEBUG)
-                messages.append(message)
-        except asyncio.CancelledError:
-            _LOGGER.debug("collect_messages cancelled")
-        _LOGGER.debug("Finished collecting messages")
+    # Subscribe before sending so that the response can't be missed
+    with conn.subscribe() as subscription:
+        await conn.send_command(command_code)
+        _LOGGER.debug("Sent command %s", command_code)
+
+        deadline = loop.time() + time_window
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                message = await asyncio.wait_for(subscription.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if message is None:
+                _LOGGER.debug("Connection closed while collecting messages")
+                break
+            _LOGGER.debug("Message received")
+            message.log(logging.DEBUG)
+            messages.append(message)
+
+    return messages
 
-    collector = asyncio.create_task(collect_messages(conn))
 
-    await conn.send_command(command_code)
-    _LOGGER.debug("Sent command %s", command_code)
+def confirmation_predicate(
+    command_code: str, last_known: Callable[[str], Any]
+) -> ConfirmationPredicate:
+    """
+    Return a predicate for the FeedbackMessage that shows command_code took effect
 
-    await asyncio.sleep(time_window)
+    last_known(field_name) gives the value of an AmpDisplayState field from
+    before the command was sent (see RotelAmpConn.last_known), or None if it
+    wasn't shown.   A change is only confirmed by a message that shows an
+    actual value for the field.   Commands that aren't recognised are
+    confirmed by any FeedbackMessage.
+    """
+    if command_code.startswith("MAIN_ZONE_"):
+        command_code = command_code[len("MAIN_ZONE_") :]
 
-    collector.cancel()
-    await collector
+    def changed(field_name: str) -> ConfirmationPredicate:
+        previous = last_known(field_name)
 
-    return messages
+        def predicate(message: FeedbackMessage) -> bool:
+            value = getattr(message.display_state, field_name)
+            return value is not None and value != previous
+
+        return predicate
+
+    def shows(field_name: str, expected: Any) -> ConfirmationPredicate:
+        def predicate(message: FeedbackMessage) -> bool:
+            return getattr(message.display_state, field_name) == expected
+
+        return predicate
+
+    m = _VOLUME_LEVEL_RE.match(command_code)
+    if m is not None:
+        return shows("volume", int(m.group(1)))
+    if command_code.startswith("SOURCE_"):
+        return changed("source_name")
+    if command_code.startswith("VOLUME_"):
+        return changed("volume")
+    if command_code == "MUTE_TOGGLE":
+        return changed("mute_on")
+    if command_code == "MUTE_ON":
+        return shows("mute_on", True)
+    if command_code == "MUTE_OFF":
+        return shows("mute_on", False)
+    if command_code == "POWER_TOGGLE":
+        return changed("is_on")
+    if command_code == "POWER_ON":
+        return shows("is_on", True)
+    if command_code.startswith("POWER_OFF"):
+        return shows("is_on", False)
+    return lambda message: True
+
+
+async def send_and_confirm(
+    conn: RotelAmpConn,
+    command_code: str,
+    predicate: Optional[ConfirmationPredicate] = None,
+    timeout: Optional[float] = None,
+) -> FeedbackMessage:
+    """
+    Send a command and return the first FeedbackMessage that confirms it
+
+    By default the confirmation depends on the command (see
+    confirmation_predicate), e.g. a new source name for SOURCE_* commands.
+    Note that this means that selecting the source that is already selected
+    won't be confirmed.   Pass predicate to decide for yourself.
+
+    If no FeedbackMessage has been received yet then a DISPLAY_REFRESH is
+    sent first (except for power commands) so that there is something to
+    compare with.   Waiting for its response can take up to another timeout.
+
+    Raises asyncio.TimeoutError if no confirmation arrives within timeout
+    seconds of sending the command.   The default timeout is the same as the
+    time window used by process_command.
+    """
+    if timeout is None:
+        timeout = _default_time_window(command_code)
+    if predicate is None:
+        if conn.last_feedback is None and "POWER" not in command_code:
+            with suppress(asyncio.TimeoutError):
+                await send_and_confirm(
+                    conn, "DISPLAY_REFRESH", lambda message: True, timeout
+                )
+        predicate = confirmation_predicate(command_code, conn.last_known)
+
+    # Subscribe before sending so that the confirmation can't be missed
+    with conn.subscribe() as subscription:
+        await conn.send_command(command_code)
+        _LOGGER.debug("Sent command %s", command_code)
+        return await asyncio.wait_for(
+            _wait_for_confirmation(subscription, predicate), timeout
+        )
+
+
+async def _wait_for_confirmation(
+    subscription: MessageSubscription[AnyMessage], predicate: ConfirmationPredicate
+) -> FeedbackMessage:
+    async for message in subscription:
+        if not isinstance(message, FeedbackMessage):
+            continue
+        try:
+            confirmed = predicate(message)
+        except ValueError as e:
+            _LOGGER.warning("Ignoring display that can't be parsed: %r", e)
+            continue
+        if confirmed:
+            return message
+    raise ConnectionError("Connection closed before the command was confirmed")
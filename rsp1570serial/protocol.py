@@ -13,13 +13,40 @@ The payload is of the form "device id", "message type", "data"
 
 import io
 import logging
-from typing import AsyncGenerator, Protocol
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import (
+    AsyncGenerator,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Protocol,
+    Union,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
 START_BYTE = 0xFE
 ESCAPE_BYTE = 0xFD
 
+_START_BYTES = bytes([START_BYTE])
+_ESCAPE_BYTES = bytes([ESCAPE_BYTE])
+_ESCAPED_START_BYTES = bytes([ESCAPE_BYTE, 0x01])
+_ESCAPED_ESCAPE_BYTES = bytes([ESCAPE_BYTE, 0x00])
+
+# Suggested read_size for a decoder that owns its reader
+BUFFERED_READ_SIZE = 1024
+
+# Maximum number of unexpected bytes kept for logging while waiting for START_BYTE
+MAX_UNEXPECTED_BYTES_LOGGED = 256
+
+# Number of distinct payloads a DuplicatePayloadFilter tracks before pruning
+_DUPLICATE_FILTER_PRUNE_SIZE = 256
+
 
 class RotelProtocolError(Exception):
     pass
@@ -35,10 +62,9 @@ class RotelInvalidByteError(Exception):
 
 class RotelUnexpectedStartByteError(RotelInvalidByteError):
     """
-    For now this is treated the same as an invalid byte error.
-    However, it might make sense to treat it like the start of a new message,
-    in which case it would invalidate the old message but we would then reset
-    in read_payload and immediately start capturing content again.
+    By default this is treated the same as an invalid byte error.
+    In resync mode it is treated like the start of a new message, so it
+    invalidates the old message but content capture starts again immediately.
     """
 
     pass
@@ -61,108 +87,461 @@ class StreamProxy:
         return self.buf.read(n)
 
 
-class ProtocolDecoder:
-    def __init__(self, ser: AnyAsyncReader):
-        self.ser = ser
-        self.bytes_received = 0
+@dataclass
+class ProtocolStats:
+    """Health counters for a FrameParser.   Safe to read at any time."""
+
+    messages: int = 0
+    checksum_errors: int = 0
+    invalid_escapes: int = 0
+    unexpected_start_bytes: int = 0
+    truncated_messages: int = 0
+    junk_bytes: int = 0
+
+
+class TimestampedPayload(bytes):
+    """
+    A payload along with when its message arrived
+
+    start_time is when the START_BYTE arrived and end_time is when the
+    checksum byte arrived, both in time.monotonic() seconds.   A FrameParser
+    stamps every byte in a chunk with the time that the chunk was fed, so
+    receive_duration is only the time on the wire when the bytes are fed as
+    they arrive, one at a time (e.g. decode_protocol_stream with the default
+    read_size=1).   With buffered reads, as RotelAmpConn does, a message
+    usually arrives in one chunk and receive_duration is 0.
+    """
+
+    start_time: float
+    end_time: float
+
+    @property
+    def receive_duration(self) -> float:
+        """Time between the first and last chunks of the message being fed"""
+        return self.end_time - self.start_time
 
-    async def next_char_without_meta_decoding(self):
-        try:
-            b = await self.ser.read(1)
-        except ConnectionResetError:
-            raise RotelEOFError(
-                "Connection reset by peer after {} bytes".format(self.bytes_received)
-            )
-        if len(b) == 0:
-            raise RotelEOFError(
-                "Encountered EOF after {} bytes".format(self.bytes_received)
-            )
-        assert len(b) == 1
-        self.bytes_received += 1
-        return b[0]
 
-    async def next_char_with_meta_decoding(self):
-        c1 = await self.next_char_without_meta_decoding()
-        if c1 == START_BYTE:
-            raise RotelUnexpectedStartByteError(
-                "Unexpected unescaped start byte encountered within message content."
+def _timestamped_payload(
+    payload: Union[bytes, bytearray, memoryview], start_time: float, end_time: float
+) -> TimestampedPayload:
+    timestamped = TimestampedPayload(payload)
+    timestamped.start_time = start_time
+    timestamped.end_time = end_time
+    return timestamped
+
+
+# Payloads are TimestampedPayloads except when a memoryview is fed to a FrameParser
+Payload = Union[bytes, memoryview]
+
+# Event returned by FrameParser: a payload or a reason why a message was discarded
+FrameEvent = Union[Payload, RotelProtocolError]
+
+_START_BYTE_RE = re.compile(b"\xfe")
+# Matches ESCAPE_BYTE or START_BYTE
+_SPECIAL_BYTES_RE = re.compile(b"[\xfd\xfe]")
+
+
+class FrameParser:
+    """
+    Incremental, sans-IO protocol decoder
+
+    Feed it the bytes as they arrive, in chunks of any size, and it returns
+    a list of events: the payload of each complete message (as a
+    TimestampedPayload) and a RotelProtocolError for each message that had to
+    be discarded.
+    If a memoryview is fed then the payload of any message that is wholly
+    within it and that needs no meta decoding is returned as a memoryview
+    into the same buffer rather than as a copy.   Such payloads carry no
+    timestamps.
+    Junk between messages is reported as a warning in the log.
+    Call close() when the stream ends to flush any work in progress.
+
+    No coroutines and no reader are involved so this can be driven from an
+    asyncio.Protocol.data_received callback or from offline tools.
+
+    If resync is True then an unescaped START_BYTE within message content
+    discards the partial message and starts a new one straight away.
+    Otherwise the START_BYTE is discarded along with the partial message.
+    Only the first MAX_UNEXPECTED_BYTES_LOGGED unexpected bytes between
+    messages are kept for logging but all of them are counted.
+
+    Counters are kept in stats.   Pass a ProtocolStats in to share one
+    between parsers, e.g. across reconnections.
+    """
+
+    def __init__(self, resync: bool = False, stats: Optional[ProtocolStats] = None):
+        self.resync = resync
+        self.stats = ProtocolStats() if stats is None else stats
+        self.bytes_received = 0
+        self._in_message = False
+        self._escape_pending = False
+        self._content = bytearray()
+        self._unexpected_bytes = bytearray()
+        self._unexpected_byte_count = 0
+        self._start_time = 0.0
+
+    @property
+    def in_message(self) -> bool:
+        """True if the parser is part way through a message"""
+        return self._in_message
+
+    def feed(
+        self, data: Union[bytes, memoryview], now: Optional[float] = None
+    ) -> List[FrameEvent]:
+        """
+        Decode a chunk of data and return the resulting events
+
+        now is when the chunk arrived and defaults to time.monotonic().
+        """
+        if now is None:
+            now = time.monotonic()
+        events: List[FrameEvent] = []
+        pos = 0
+        end = len(data)
+        while pos < end:
+            if self._in_message:
+                pos = self._feed_content(data, pos, events, now)
+                continue
+            m = _START_BYTE_RE.search(data, pos)
+            if m is None:
+                self._add_unexpected_bytes(data, pos, end)
+                self.bytes_received += end - pos
+                break
+            start = m.start()
+            self._add_unexpected_bytes(data, pos, start)
+            self.bytes_received += start + 1 - pos
+            pos = start + 1
+            self._start_message(now)
+            pos = self._feed_unescaped_message(data, pos, events, now)
+        return events
+
+    def feed_byte(self, c: int, now: Optional[float] = None) -> Optional[FrameEvent]:
+        """
+        Decode a single byte and return the resulting event, if any
+
+        Equivalent to feed(bytes([c]), now), which never returns more than
+        one event, but cheap for the usual case of a plain content byte.
+        """
+        if (
+            not self._in_message
+            or self._escape_pending
+            or c == START_BYTE
+            or c == ESCAPE_BYTE
+        ):
+            events = self.feed(bytes((c,)), now)
+            return events[0] if events else None
+        self.bytes_received += 1
+        content = self._content
+        content.append(c)
+        if len(content) < content[0] + 2:
+            return None
+        return self._end_message(time.monotonic() if now is None else now)
+
+    def _add_unexpected_bytes(
+        self, data: Union[bytes, memoryview], start: int, end: int
+    ):
+        self._unexpected_byte_count += end - start
+        self.stats.junk_bytes += end - start
+        room = MAX_UNEXPECTED_BYTES_LOGGED - len(self._unexpected_bytes)
+        if room > 0:
+            self._unexpected_bytes += data[start : min(end, start + room)]
+
+    def close(self) -> List[FrameEvent]:
+        events: List[FrameEvent] = []
+        if self._in_message:
+            self._in_message = False
+            self.stats.truncated_messages += 1
+            events.append(
+                RotelProtocolError(
+                    "Unexpected EOF encountered.  Work in progress discarded: {}".format(
+                        self._content
+                    )
+                )
             )
-        elif c1 != ESCAPE_BYTE:
-            return c1
-        c2 = await self.next_char_without_meta_decoding()
-        if c2 == 0x00:
-            return ESCAPE_BYTE
-        elif c2 == 0x01:
-            return START_BYTE
-        else:
-            raise RotelInvalidByteError(
-                "Invalid byte following ESCAPE_BYTE ({:X}).".format(c2)
+        elif self._unexpected_byte_count > 0:
+            _LOGGER.warning(
+                "%d unexpected bytes discarded when EOF encountered: %r",
+                self._unexpected_byte_count,
+                self._unexpected_bytes,
             )
+            self._unexpected_bytes = bytearray()
+            self._unexpected_byte_count = 0
+        return events
 
-    async def wait_for_start_byte(self):
-        unexpected_bytes = bytearray()
-        while True:
-            try:
-                c = await self.next_char_without_meta_decoding()
-            except RotelEOFError:
-                if len(unexpected_bytes) > 0:
-                    _LOGGER.warning(
-                        "%d unexpected bytes discarded when EOF encountered: %r",
-                        len(unexpected_bytes),
-                        unexpected_bytes,
-                    )
-                raise
-            if c == START_BYTE:
-                break
-            unexpected_bytes.append(c)
-        if len(unexpected_bytes) > 0:
+    def _start_message(self, now: float):
+        if self._unexpected_byte_count > 0:
             _LOGGER.warning(
                 "%d unexpected bytes encountered while waiting for START_BYTE: %r",
-                len(unexpected_bytes),
-                unexpected_bytes,
+                self._unexpected_byte_count,
+                self._unexpected_bytes,
             )
+            self._unexpected_bytes = bytearray()
+            self._unexpected_byte_count = 0
         _LOGGER.debug(
             "Start byte encountered at byte %d in stream", self.bytes_received
         )
-
-    async def read_payload(self):
-        await self.wait_for_start_byte()
-        content = bytearray()
-        try:
-            content.append(await self.next_char_with_meta_decoding())
-            # pylint: disable=unused-variable
-            for x in range(content[0]):
-                content.append(await self.next_char_with_meta_decoding())
-            content.append(await self.next_char_with_meta_decoding())
-        except RotelEOFError:
-            raise RotelProtocolError(
-                "Unexpected EOF encountered.  Work in progress discarded: {}".format(
-                    content
+        self._in_message = True
+        self._escape_pending = False
+        self._content = bytearray()
+        self._start_time = now
+
+    def _feed_unescaped_message(
+        self,
+        data: Union[bytes, memoryview],
+        pos: int,
+        events: List[FrameEvent],
+        now: float,
+    ) -> int:
+        """
+        Fast path for a message that is wholly within data and has no escapes
+
+        Returns pos unchanged if the message needs the general path.
+        """
+        end = len(data)
+        if pos >= end:
+            return pos
+        checksum_pos = pos + data[pos] + 1
+        if checksum_pos >= end or _SPECIAL_BYTES_RE.search(data, pos, checksum_pos + 1):
+            return pos
+        self._in_message = False
+        self.bytes_received += checksum_pos + 1 - pos
+        expected_checksum = data[checksum_pos]
+        actual_checksum = calculate_checksum(data[pos:checksum_pos])
+        if expected_checksum != actual_checksum:
+            events.append(
+                self._checksum_error(
+                    bytearray(data[pos:checksum_pos]),
+                    expected_checksum,
+                    actual_checksum,
                 )
             )
-        except RotelInvalidByteError:
-            raise RotelProtocolError(
-                "Invalid byte encountered while processing message content.  Work in progress discarded: {}".format(
-                    content
-                )
+            return checksum_pos + 1
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug(
+                "Valid content of length %d received: %r",
+                checksum_pos + 1 - pos,
+                bytearray(data[pos : checksum_pos + 1]),
+            )
+        self.stats.messages += 1
+        payload = data[pos + 1 : checksum_pos]
+        if isinstance(payload, memoryview):
+            events.append(payload)
+        else:
+            events.append(_timestamped_payload(payload, now, now))
+        return checksum_pos + 1
+
+    def _feed_content(
+        self,
+        data: Union[bytes, memoryview],
+        pos: int,
+        events: List[FrameEvent],
+        now: float,
+    ) -> int:
+        content = self._content
+        end = len(data)
+        while pos < end:
+            c = data[pos]
+            pos += 1
+            self.bytes_received += 1
+            if c == START_BYTE:
+                self.stats.unexpected_start_bytes += 1
+                if self.resync:
+                    events.append(
+                        RotelProtocolError(
+                            "Unexpected START_BYTE encountered while processing message content.  Work in progress discarded: {}".format(
+                                content
+                            )
+                        )
+                    )
+                    self._start_message(now)
+                    content = self._content
+                    continue
+                events.append(self._invalid_byte())
+                return pos
+            elif self._escape_pending:
+                self._escape_pending = False
+                if c == 0x00:
+                    content.append(ESCAPE_BYTE)
+                elif c == 0x01:
+                    content.append(START_BYTE)
+                else:
+                    self.stats.invalid_escapes += 1
+                    events.append(self._invalid_byte())
+                    return pos
+            elif c == ESCAPE_BYTE:
+                self._escape_pending = True
+                continue
+            else:
+                content.append(c)
+                # Copy any run of bytes that need no meta decoding in one step
+                needed = content[0] + 2 - len(content)
+                if needed > 0 and pos < end:
+                    run_end = min(pos + needed, end)
+                    m = _SPECIAL_BYTES_RE.search(data, pos, run_end)
+                    if m is not None:
+                        run_end = m.start()
+                    content += data[pos:run_end]
+                    self.bytes_received += run_end - pos
+                    pos = run_end
+            if len(content) == content[0] + 2:
+                events.append(self._end_message(now))
+                return pos
+        return pos
+
+    def _invalid_byte(self) -> RotelProtocolError:
+        self._in_message = False
+        return RotelProtocolError(
+            "Invalid byte encountered while processing message content.  Work in progress discarded: {}".format(
+                self._content
             )
+        )
 
+    def _end_message(self, now: float) -> FrameEvent:
+        self._in_message = False
+        content = self._content
         body = content[0:-1]
-        expected_checksum = content[-1:][0]
+        expected_checksum = content[-1]
         actual_checksum = calculate_checksum(body)
         if expected_checksum != actual_checksum:
-            raise RotelProtocolError(
-                "Invalid checksum.\nBody: {!r}\nLen body: {}, Expected checksum: {:X}, Actual checksum: {:X}".format(
-                    body, len(body), expected_checksum, actual_checksum
-                )
-            )
+            return self._checksum_error(body, expected_checksum, actual_checksum)
         _LOGGER.debug("Valid content of length %d received: %r", len(content), content)
-        return content[1:-1]
+        self.stats.messages += 1
+        return _timestamped_payload(content[1:-1], self._start_time, now)
+
+    def _checksum_error(
+        self, body: bytearray, expected_checksum: int, actual_checksum: int
+    ) -> RotelProtocolError:
+        self.stats.checksum_errors += 1
+        return RotelProtocolError(
+            "Invalid checksum.\nBody: {!r}\nLen body: {}, Expected checksum: {:X}, Actual checksum: {:X}".format(
+                body, len(body), expected_checksum, actual_checksum
+            )
+        )
+
+
+class ProtocolDecoder:
+    """
+    Decode payloads from an AnyAsyncReader using a FrameParser
+
+    By default the decoder reads one byte at a time so that it never consumes
+    bytes beyond the end of the current message.   This matters if the caller
+    goes on to read from the same reader once the decoder is done with it.
+    Single bytes are passed to FrameParser.feed_byte, which keeps this cheap.
+    If the decoder owns the reader for its whole lifetime then a larger
+    read_size (e.g. BUFFERED_READ_SIZE) reads fewer times, in which case
+    whatever is available (up to read_size bytes) is pulled in one call and
+    messages are decoded from an internal buffer.
+    """
 
+    def __init__(
+        self,
+        ser: AnyAsyncReader,
+        read_size: int = 1,
+        resync: bool = False,
+        stats: Optional[ProtocolStats] = None,
+    ):
+        if read_size < 1:
+            raise ValueError("Invalid read_size: {}".format(read_size))
+        self.ser = ser
+        self.read_size = read_size
+        self.parser = FrameParser(resync, stats)
+        self._events: Deque[FrameEvent] = deque()
+
+    @property
+    def bytes_received(self) -> int:
+        return self.parser.bytes_received
+
+    @property
+    def stats(self) -> ProtocolStats:
+        return self.parser.stats
+
+    async def read_payload(self) -> bytes:
+        events = self._events
+        parser = self.parser
+        read = self.ser.read
+        read_size = self.read_size
+        while not events:
+            try:
+                data = await read(read_size)
+            except ConnectionResetError:
+                events.extend(parser.close())
+                if not events:
+                    raise RotelEOFError(
+                        "Connection reset by peer after {} bytes".format(
+                            self.bytes_received
+                        )
+                    )
+            else:
+                if len(data) == 1:
+                    event = parser.feed_byte(data[0])
+                    if event is not None:
+                        events.append(event)
+                elif data:
+                    events.extend(parser.feed(data))
+                else:
+                    events.extend(parser.close())
+                    if not events:
+                        raise RotelEOFError(
+                            "Encountered EOF after {} bytes".format(self.bytes_received)
+                        )
+        event = self._events.popleft()
+        if isinstance(event, RotelProtocolError):
+            raise event
+        assert isinstance(event, bytes)
+        return event
+
+
+class DuplicatePayloadFilter:
+    """
+    Detect payloads that repeat within a time window
+
+    A payload is a duplicate if an identical payload was passed (and not
+    found to be a duplicate) within the last window seconds.   So each
+    distinct payload gets through at most once per window.   This is
+    meant for the feedback messages that the amp repeats while muted.
+    Payloads are compared by hash so no message needs to be built.
+    """
 
-async def decode_protocol_stream(ser: AnyAsyncReader) -> AsyncGenerator[bytes, None]:
+    def __init__(self, window: float):
+        self.window = window
+        self._last_passed: Dict[bytes, float] = {}
+        self._prune_size = _DUPLICATE_FILTER_PRUNE_SIZE
+
+    def is_duplicate(self, payload: bytes, now: Optional[float] = None) -> bool:
+        """
+        now defaults to the payload's end_time if it is a TimestampedPayload
+        and to time.monotonic() otherwise.
+        """
+        if now is None:
+            if isinstance(payload, TimestampedPayload):
+                now = payload.end_time
+            else:
+                now = time.monotonic()
+        last_passed = self._last_passed.get(payload)
+        if last_passed is not None and now - last_passed < self.window:
+            return True
+        self._last_passed[payload] = now
+        if len(self._last_passed) > self._prune_size:
+            self._prune(now)
+        return False
+
+    def _prune(self, now: float):
+        self._last_passed = {
+            payload: last_passed
+            for payload, last_passed in self._last_passed.items()
+            if now - last_passed < self.window
+        }
+        self._prune_size = max(_DUPLICATE_FILTER_PRUNE_SIZE, len(self._last_passed) * 2)
+
+
+async def decode_protocol_stream(
+    ser: AnyAsyncReader,
+    read_size: int = 1,
+    resync: bool = False,
+    stats: Optional[ProtocolStats] = None,
+) -> AsyncGenerator[bytes, None]:
     _LOGGER.debug("Started decoding protocol stream")
-    decoder = ProtocolDecoder(ser)
+    decoder = ProtocolDecoder(ser, read_size, resync, stats)
     while True:
         try:
             payload = await decoder.read_payload()
@@ -175,31 +554,45 @@ async def decode_protocol_stream(ser: AnyAsyncReader) -> AsyncGenerator[bytes, N
     _LOGGER.debug("Finished decoding protocol stream")
 
 
-def encode_payload(payload):
-    body = [len(payload)]
-    body.extend(payload)
-    checksum = calculate_checksum(body)
-    content = body
-    content.append(checksum)
-    message = meta_escape(content)
-    message.insert(0, START_BYTE)
-    return bytes(message)
+def decode_protocol_buffer(buf: Union[bytes, memoryview]) -> List[Payload]:
+    """
+    Decode all of the payloads in an in-memory buffer such as a capture
 
+    Payloads of messages that need no meta decoding are returned as
+    memoryviews into buf without copying.   Only messages that contain an
+    ESCAPE_BYTE are unescaped into a new buffer.
+    Errors are logged and discarded as in decode_protocol_stream.
+    """
+    parser = FrameParser()
+    payloads: List[Payload] = []
+    for event in parser.feed(memoryview(buf)) + parser.close():
+        if isinstance(event, RotelProtocolError):
+            _LOGGER.error(event)
+        else:
+            payloads.append(event)
+    return payloads
 
-def calculate_checksum(sequence):
-    cs = 0
-    for item in sequence:
-        cs += item
-    return cs & 0xFF
 
+def encode_payload(payload) -> bytes:
+    body = bytearray([len(payload)])
+    body += bytes(payload)
+    body.append(calculate_checksum(body))
+    return _START_BYTES + meta_escape(body)
 
-def meta_escape(raw_message):
-    message = []
-    for b in raw_message:
-        if b == ESCAPE_BYTE:
-            message.extend([ESCAPE_BYTE, 0x00])
-        elif b == START_BYTE:
-            message.extend([ESCAPE_BYTE, 0x01])
-        else:
-            message.append(b)
-    return message
+
+def encode_many(payloads: Iterable) -> bytes:
+    """Encode a batch of payloads into one contiguous buffer"""
+    return b"".join([encode_payload(payload) for payload in payloads])
+
+
+def calculate_checksum(sequence) -> int:
+    return sum(sequence) & 0xFF
+
+
+def meta_escape(raw_message) -> bytes:
+    """Escape any ESCAPE_BYTE or START_BYTE in raw_message"""
+    return (
+        bytes(raw_message)
+        .replace(_ESCAPE_BYTES, _ESCAPED_ESCAPE_BYTES)
+        .replace(_START_BYTES, _ESCAPED_START_BYTES)
+    )
@@ -0,0 +1,106 @@
+"""
+Model of the RSP-1572 smart display
+
+The smart display has 10 lines.   Line 1 is sent in Smart Display Data
+String 1 messages and lines 2 to 10 in Smart Display Data String 2 messages.
+SmartDisplayState keeps the latest contents of every line and reports which
+lines each message changed, so that a UI only needs to redraw those lines.
+
+When the iPod/USB source is in use, line 2 shows a play state symbol, the
+elapsed time and the track counter, e.g. "<play symbol> 01:23 <T>003/012".
+SmartDisplayState.now_playing parses it.
+"""
+
+import re
+from dataclasses import dataclass
+from enum import Enum
+from typing import List, Optional
+
+from rsp1570serial.messages import (
+    PAUSE_BYTES,
+    RIGHT_BYTES,
+    STOP_BYTES,
+    SmartDisplayMessage,
+)
+
+SMART_DISPLAY_LINE_COUNT = 10
+
+# Line that shows the play state, elapsed time and track counter
+NOW_PLAYING_LINE = 2
+
+
+class PlayState(Enum):
+    PLAYING = RIGHT_BYTES.decode("utf-8")
+    PAUSED = PAUSE_BYTES.decode("utf-8")
+    STOPPED = STOP_BYTES.decode("utf-8")
+
+
+# Every part is optional so this always matches
+_NOW_PLAYING_RE = re.compile(
+    r"(?P<play_state>"
+    + "|".join(re.escape(state.value) for state in PlayState)
+    + r")?\s*(?P<elapsed>(?:\d+:)?\d+:\d\d)?\s*(?:\D?(?P<track>\d+)/(?P<count>\d+))?"
+)
+
+
+@dataclass(frozen=True)
+class NowPlaying:
+    """Structured contents of the now playing line"""
+
+    play_state: Optional[PlayState]
+    elapsed_seconds: Optional[int]
+    track_number: Optional[int]
+    track_count: Optional[int]
+
+
+def parse_now_playing_line(line: str) -> NowPlaying:
+    """Parse the now playing line.   Fields that aren't shown are None."""
+    m = _NOW_PLAYING_RE.match(line)
+    assert m is not None
+    play_state = None
+    if m.group("play_state") is not None:
+        play_state = PlayState(m.group("play_state"))
+    elapsed_seconds = None
+    if m.group("elapsed") is not None:
+        elapsed_seconds = 0
+        for part in m.group("elapsed").split(":"):
+            elapsed_seconds = elapsed_seconds * 60 + int(part)
+    track_number = track_count = None
+    if m.group("track") is not None:
+        track_number = int(m.group("track"))
+        track_count = int(m.group("count"))
+    return NowPlaying(play_state, elapsed_seconds, track_number, track_count)
+
+
+class SmartDisplayState:
+    """
+    The latest contents of the 10 smart display lines
+
+    Lines are numbered from 1 as on the display and are empty until a
+    message has been received for them.
+    """
+
+    def __init__(self):
+        self.lines: List[str] = [""] * SMART_DISPLAY_LINE_COUNT
+        self._now_playing: Optional[NowPlaying] = None
+
+    def update(self, message: SmartDisplayMessage) -> List[int]:
+        """Apply a message and return the numbers of the lines that changed"""
+        changed = []
+        for lineno, line in enumerate(message.lines, message.start):
+            if self.lines[lineno - 1] != line:
+                self.lines[lineno - 1] = line
+                changed.append(lineno)
+        if NOW_PLAYING_LINE in changed:
+            self._now_playing = None
+        return changed
+
+    def line(self, lineno: int) -> str:
+        return self.lines[lineno - 1]
+
+    @property
+    def now_playing(self) -> NowPlaying:
+        """The now playing line, parsed once each time it changes"""
+        if self._now_playing is None:
+            self._now_playing = parse_now_playing_line(self.line(NOW_PLAYING_LINE))
+        return self._now_playing
@@ -41,9 +41,11 @@ class EmulatorTestHelper:
         self._device = None
         self._device_context = None
 
-    def create_conn(self) -> AsyncContextManager[RotelAmpConn]:
+    def create_conn(
+        self, use_protocol: bool = False, **kwargs
+    ) -> AsyncContextManager[RotelAmpConn]:
         url = f"socket://:{self.port}"
-        return create_rotel_amp_conn(url, self.meta)
+        return create_rotel_amp_conn(url, self.meta, use_protocol, **kwargs)
 
     @property
     def device(self) -> RotelRSP1570Emulator:
@@ -0,0 +1,84 @@
+import logging
+import os
+import tempfile
+from unittest import TestCase
+
+from rsp1570serial.capture import (
+    decode_capture_file,
+    decode_capture_file_parallel,
+    decode_capture_payloads,
+)
+from rsp1570serial.messages import CommandMessage, FeedbackMessage, MessageCodec
+from rsp1570serial.protocol import encode_many
+from rsp1570serial.rotel_model_meta import RSP1570_META
+
+FEEDBACK_PAYLOAD = (
+    b"\xa3\x20FIRE TV       VOL  64DOLBY PL\x19 C     48K  \x00F\x08\x00\xfc"
+)
+
+
+def summarise(messages):
+    return [
+        m.lines[0] if isinstance(m, FeedbackMessage) else m.key
+        for m in messages
+        if isinstance(m, (FeedbackMessage, CommandMessage))
+    ]
+
+
+class TestCapture(TestCase):
+    def setUp(self) -> None:
+        self.codec = MessageCodec(RSP1570_META)
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self) -> None:
+        os.remove(self.path)
+
+    def write_capture(self, data: bytes) -> None:
+        with open(self.path, "wb") as f:
+            f.write(data)
+
+    def test_decode_capture_file(self):
+        payloads = [FEEDBACK_PAYLOAD, b"\xa3\x10\x0a", b"\xa3\x30\x28"] * 100
+        self.write_capture(encode_many(payloads))
+        messages = list(decode_capture_file(self.path, RSP1570_META, chunk_size=7))
+        self.assertEqual(len(messages), 300)
+        assert isinstance(messages[0], FeedbackMessage)
+        self.assertEqual(messages[0].lines[0], "FIRE TV       VOL  64")
+        assert isinstance(messages[2], CommandMessage)
+        self.assertEqual(messages[2].key, b"\x28")
+
+    def test_truncated_capture(self):
+        data = encode_many([FEEDBACK_PAYLOAD, FEEDBACK_PAYLOAD])
+        self.write_capture(data[:-3])
+        with self.assertLogs(level=logging.ERROR) as cm:
+            payloads = list(decode_capture_payloads(self.path))
+        self.assertEqual(payloads, [FEEDBACK_PAYLOAD])
+        self.assertEqual(len(cm.output), 1)
+        self.assertTrue(
+            cm.output[0].startswith(
+                "ERROR:rsp1570serial.capture:Unexpected EOF encountered."
+            )
+        )
+
+    def test_empty_capture(self):
+        self.assertEqual(list(decode_capture_file(self.path, RSP1570_META)), [])
+
+    def test_decode_capture_file_parallel(self):
+        frames = [
+            encode_many([FEEDBACK_PAYLOAD, bytes([0xA3, 0x30, volume])])
+            for volume in range(0x60)
+        ]
+        # Glitch: truncate some messages so that the next START_BYTE is unexpected
+        for i in range(0, len(frames), 7):
+            frames[i] = frames[i][:20]
+        self.write_capture(b"".join(frames))
+        with self.assertLogs(level=logging.ERROR):
+            expected = summarise(decode_capture_file(self.path, RSP1570_META))
+            actual = summarise(
+                decode_capture_file_parallel(
+                    self.path, RSP1570_META, max_workers=2, part_count=50
+                )
+            )
+        self.assertGreater(len(expected), 100)
+        self.assertEqual(actual, expected)
@@ -1,6 +1,7 @@
 from unittest import TestCase
 
 from rsp1570serial.messages import MessageCodec
+from rsp1570serial.protocol import encode_payload
 from rsp1570serial.rotel_model_meta import RSP1570_META
 
 
@@ -63,3 +64,15 @@ class RotelTestCommands(TestCase):
             self.codec.encode_volume_direct_command(1, -1)
         with self.assertRaises(ValueError):
             self.codec.encode_volume_direct_command(1, 97)
+
+    def test_precompiled_frames_match_encode_payload(self):
+        for command_name, [message_type, key] in RSP1570_META.messages.items():
+            self.assertEqual(
+                self.codec.encode_command(command_name),
+                encode_payload([RSP1570_META.device_id, message_type, key]),
+            )
+        for volume in range(RSP1570_META.min_volume, RSP1570_META.max_volume + 1):
+            self.assertEqual(
+                self.codec.encode_volume_direct_command(2, volume),
+                encode_payload([RSP1570_META.device_id, 0x32, volume]),
+            )
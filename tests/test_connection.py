@@ -1,11 +1,28 @@
 import asyncio
-from unittest import IsolatedAsyncioTestCase
+from typing import Any, Dict
+from unittest import IsolatedAsyncioTestCase, TestCase
 
+from rsp1570serial.connection import (
+    MessageSubscription,
+    OverflowPolicy,
+    PacingPolicy,
+    ReconnectPolicy,
+)
+from rsp1570serial.events import ConnectionState, PowerChanged, SourceChanged
+from rsp1570serial.messages import (
+    FeedbackMessage,
+    SmartDisplayMessage,
+    TriggerMessage,
+)
 from rsp1570serial.rotel_model_meta import RSP1570_META
 from tests.emulator_test_helper import EmulatorTestHelper
 
 
-class AsyncTestConnection(IsolatedAsyncioTestCase):
+class ConnectionTestsMixin:
+    """Tests run against both connection modes, which vary conn_kwargs"""
+
+    conn_kwargs: Dict[str, Any] = {}
+
     async def asyncSetUp(self):
         self.helper = EmulatorTestHelper(RSP1570_META, is_on=True)
         await self.helper.asyncSetUp()
@@ -13,6 +30,223 @@ class AsyncTestConnection(IsolatedAsyncioTestCase):
     async def asyncTearDown(self):
         await self.helper.asyncTearDown()
 
+    async def test_read_messages_fan_out(self):
+        async def collect(conn, n):
+            messages = []
+            async for message in conn.read_messages():
+                if isinstance(message, FeedbackMessage):
+                    messages.append(message.parse_display_lines()["source_name"])
+                    if len(messages) == n:
+                        break
+            return messages
+
+        async with self.helper.create_conn(**self.conn_kwargs) as conn:
+            # The first reader stops early without disturbing the second
+            collectors = [asyncio.create_task(collect(conn, n)) for n in (1, 2)]
+            await asyncio.sleep(0)
+            await conn.send_command("SOURCE_TUNER")
+            await asyncio.sleep(0.1)
+            await conn.send_command("SOURCE_CD")
+            results = await asyncio.wait_for(asyncio.gather(*collectors), 1.0)
+        self.assertEqual(results, [["TUNER"], ["TUNER", " CD"]])
+
+    async def test_subscribe(self):
+        async with self.helper.create_conn(**self.conn_kwargs) as conn:
+            subscription = conn.subscribe()
+            await conn.send_command("SOURCE_TUNER")
+            message = await asyncio.wait_for(subscription.get(), 1.0)
+        assert isinstance(message, FeedbackMessage)
+        self.assertEqual(message.parse_display_lines()["source_name"], "TUNER")
+        await asyncio.sleep(0)
+        self.assertTrue(subscription.closed)
+        self.assertTrue(conn.subscribe().closed)
+
+    async def test_payload_callback(self):
+        payloads = []
+        async with self.helper.create_conn(**self.conn_kwargs) as conn:
+            conn.add_payload_callback(payloads.append)
+            await conn.send_command("SOURCE_TUNER")
+            await asyncio.sleep(0.1)
+        self.assertEqual(len(payloads), 1)
+        self.assertIsInstance(conn.codec.decode_message(payloads[0]), FeedbackMessage)
+
+    async def test_connection_lost(self):
+        async with self.helper.create_conn(**self.conn_kwargs) as conn:
+            with conn.subscribe() as subscription:
+                (conn.transport or conn.writer.transport).abort()
+                self.assertIsNone(await asyncio.wait_for(subscription.get(), 1.0))
+            self.assertEqual(conn.state, ConnectionState.DISCONNECTED)
+            await conn.send_command("SOURCE_TUNER")  # Ignored
+
+    async def test_block_pauses_reading(self):
+        async with self.helper.create_conn(**self.conn_kwargs) as conn:
+            blocking = conn.subscribe(max_depth=1, overflow=OverflowPolicy.BLOCK)
+            other = conn.subscribe()
+            await conn.send_command("SOURCE_TUNER")
+            await asyncio.sleep(0.1)
+            self.assertTrue(blocking.paused)
+            await conn.send_command("SOURCE_CD")
+            await asyncio.sleep(0.1)
+            # Nothing more is read until the blocking subscriber catches up
+            self.assertEqual(len(other), 1)
+            await blocking.get()
+            await asyncio.wait_for(blocking.get(), 1.0)
+            self.assertEqual(len(other), 2)
+            self.assertEqual(blocking.dropped, 0)
+
+    async def test_reconnect(self):
+        states = []
+        reconnecting = asyncio.get_running_loop().create_future()
+
+        def on_state_changed(event):
+            states.append(event.state)
+            if event.state is ConnectionState.RECONNECTING:
+                reconnecting.set_result(None)
+
+        async with self.helper.create_conn(
+            reconnect=ReconnectPolicy(initial_delay=0.05), **self.conn_kwargs
+        ) as conn:
+            conn.add_connection_state_callback(on_state_changed)
+            with conn.subscribe() as subscription:
+                # Simulate the USB-serial adapter resetting
+                (conn.transport or conn.writer.transport).abort()
+                await asyncio.wait_for(reconnecting, 1.0)
+                # Sent once the port has been reopened
+                await conn.send_command("SOURCE_TUNER")
+                sources = []
+                while "TUNER" not in sources:
+                    message = await asyncio.wait_for(subscription.get(), 1.0)
+                    assert isinstance(message, FeedbackMessage)
+                    sources.append(message.display_state.source_name)
+            self.assertEqual(conn.state, ConnectionState.CONNECTED)
+        # The DISPLAY_REFRESH sent after reconnecting comes first
+        self.assertEqual(sources, ["VIDEO 1", "TUNER"])
+        self.assertEqual(
+            states,
+            [
+                ConnectionState.RECONNECTING,
+                ConnectionState.CONNECTED,
+                ConnectionState.DISCONNECTED,
+            ],
+        )
+
+    async def test_unsent_commands_fail_on_close(self):
+        pacing = PacingPolicy(min_interval=10)
+        async with self.helper.create_conn(pacing=pacing, **self.conn_kwargs) as conn:
+            await conn.send_command("SOURCE_TUNER")
+            unsent = asyncio.create_task(conn.send_command("SOURCE_CD"))
+            await asyncio.sleep(0.05)
+        with self.assertRaises(ConnectionError):
+            await unsent
+        self.assertEqual(self.helper.device._source, "TUNER")
+
+    async def test_unsent_commands_fail_on_connection_lost(self):
+        pacing = PacingPolicy(min_interval=10)
+        async with self.helper.create_conn(pacing=pacing, **self.conn_kwargs) as conn:
+            await conn.send_command("SOURCE_TUNER")
+            unsent = asyncio.create_task(conn.send_command("SOURCE_CD"))
+            await asyncio.sleep(0.05)
+            (conn.transport or conn.writer.transport).abort()
+            with self.assertRaises(ConnectionError):
+                await asyncio.wait_for(unsent, 1.0)
+
+    async def test_only_feedback_ends_in_flight(self):
+        pacing = PacingPolicy(max_in_flight=1, response_timeout=10)
+        async with self.helper.create_conn(pacing=pacing, **self.conn_kwargs) as conn:
+            await conn.send_command("DISPLAY_REFRESH")
+            self.assertEqual(len(conn._in_flight), 1)
+            conn._dispatch_message(SmartDisplayMessage(["line"], 1))
+            self.assertEqual(len(conn._in_flight), 1)
+            await asyncio.sleep(0.1)  # The feedback for DISPLAY_REFRESH
+            self.assertEqual(len(conn._in_flight), 0)
+
+    async def test_reconnect_queue_limit(self):
+        reconnect = ReconnectPolicy(initial_delay=0.2, jitter=0, max_queued=2)
+        async with self.helper.create_conn(
+            reconnect=reconnect, **self.conn_kwargs
+        ) as conn:
+            with conn.subscribe() as subscription:
+                (conn.transport or conn.writer.transport).abort()
+                while conn.state is not ConnectionState.RECONNECTING:
+                    await asyncio.sleep(0.01)
+                sends = [
+                    asyncio.create_task(conn.send_command(command))
+                    for command in ("SOURCE_TUNER", "SOURCE_CD")
+                ]
+                await asyncio.sleep(0)
+                with self.assertRaises(ConnectionError):
+                    await conn.send_command("SOURCE_VIDEO_1")
+                await asyncio.wait_for(asyncio.gather(*sends), 1.0)
+                sources = []
+                while len(sources) < 3:
+                    message = await asyncio.wait_for(subscription.get(), 1.0)
+                    assert isinstance(message, FeedbackMessage)
+                    sources.append(message.display_state.source_name)
+        self.assertEqual(sources, ["VIDEO 1", "TUNER", " CD"])
+
+    async def test_pacing(self):
+        pacing = PacingPolicy(min_interval=0.02, max_in_flight=1, response_timeout=5)
+        loop = asyncio.get_running_loop()
+        async with self.helper.create_conn(pacing=pacing, **self.conn_kwargs) as conn:
+            with conn.subscribe() as subscription:
+                start = loop.time()
+                # A burst of commands is written in order, one gap apart
+                await asyncio.gather(
+                    *(conn.send_volume_direct_command(1, v) for v in range(40, 45))
+                )
+                self.assertGreaterEqual(loop.time() - start, 4 * 0.02)
+                volumes = []
+                for _ in range(5):
+                    message = await asyncio.wait_for(subscription.get(), 1.0)
+                    assert isinstance(message, FeedbackMessage)
+                    volumes.append(message.display_state.volume)
+        self.assertEqual(volumes, [40, 41, 42, 43, 44])
+        self.assertEqual(self.helper.device._volume, 44)
+
+    async def test_feedback_only_parsed_when_needed(self):
+        async with self.helper.create_conn(**self.conn_kwargs) as conn:
+            with conn.subscribe() as subscription:
+                await conn.send_command("SOURCE_TUNER")
+                message = await asyncio.wait_for(subscription.get(), 1.0)
+            self.assertIs(conn.last_feedback, message)
+            self.assertIsNone(message._decoded.display_state)
+            self.assertEqual(conn.last_known("source_name"), "TUNER")
+
+    async def test_events_ignore_unparseable_display(self):
+        async def collect(conn):
+            async for event in conn.events():
+                if isinstance(event, SourceChanged):
+                    return event
+
+        unparseable = FeedbackMessage("FIRE TV       VOL  --", " " * 21, b"\x00" * 5)
+        async with self.helper.create_conn(**self.conn_kwargs) as conn:
+            collector = asyncio.create_task(collect(conn))
+            await asyncio.sleep(0)
+            with self.assertLogs("rsp1570serial.connection", "WARNING"):
+                conn._dispatch_message(unparseable)
+            await conn.send_command("SOURCE_TUNER")
+            event = await asyncio.wait_for(collector, 1.0)
+        self.assertEqual(event, SourceChanged("TUNER"))
+
+    async def test_events_share_state(self):
+        async with self.helper.create_conn(**self.conn_kwargs) as conn:
+            first = conn.events()
+            first_event = asyncio.ensure_future(first.__anext__())
+            await asyncio.sleep(0)
+            await conn.send_command("DISPLAY_REFRESH")
+            self.assertEqual(
+                await asyncio.wait_for(first_event, 1.0), PowerChanged(True)
+            )
+            # A later consumer is told what is already known straight away
+            late = conn.events()
+            self.assertEqual(
+                await asyncio.wait_for(late.__anext__(), 1.0), PowerChanged(True)
+            )
+            await late.aclose()
+            await first.aclose()
+
+
+class AsyncTestConnection(ConnectionTestsMixin, IsolatedAsyncioTestCase):
     async def test_send_command1(self):
         assert self.helper.device is not None
         self.assertEqual(self.helper.device._is_muted, False)
@@ -31,3 +265,137 @@ class AsyncTestConnection(IsolatedAsyncioTestCase):
         async with self.helper.create_conn() as conn:
             await conn.send_volume_direct_command(1, 55)
         self.assertEqual(self.helper.device._volume, 55)
+
+
+class AsyncTestProtocolConnection(ConnectionTestsMixin, IsolatedAsyncioTestCase):
+    conn_kwargs = {"use_protocol": True}
+
+    async def test_send_command(self):
+        async with self.helper.create_conn(**self.conn_kwargs) as conn:
+            self.assertTrue(conn.is_open)
+            await conn.send_command("SOURCE_TUNER")
+            await asyncio.sleep(0.1)
+        self.assertFalse(conn.is_open)
+        self.assertEqual(self.helper.device._source, "TUNER")
+
+    async def test_message_callback(self):
+        messages = []
+        async with self.helper.create_conn(**self.conn_kwargs) as conn:
+            remove_callback = conn.add_message_callback(messages.append)
+            await conn.send_volume_direct_command(1, 55)
+            await asyncio.sleep(0.1)
+            remove_callback()
+            await conn.send_volume_direct_command(1, 56)
+            await asyncio.sleep(0.1)
+        self.assertEqual(len(messages), 1)
+        assert isinstance(messages[0], FeedbackMessage)
+        self.assertEqual(messages[0].parse_display_lines()["volume"], 55)
+
+    async def test_read_messages(self):
+        async def collect(conn, n):
+            messages = []
+            async for message in conn.read_messages():
+                messages.append(message)
+                if len(messages) == n:
+                    break
+            return messages
+
+        async with self.helper.create_conn(**self.conn_kwargs) as conn:
+            collectors = [asyncio.create_task(collect(conn, 2)) for _ in range(2)]
+            await asyncio.sleep(0)
+            await conn.send_command("SOURCE_TUNER")
+            await conn.send_command("SOURCE_CD")
+            results = await asyncio.wait_for(asyncio.gather(*collectors), 1.0)
+        for messages in results:
+            self.assertEqual(
+                [
+                    m.parse_display_lines()["source_name"]
+                    for m in messages
+                    if isinstance(m, FeedbackMessage)
+                ],
+                ["TUNER", " CD"],
+            )
+
+    async def test_events(self):
+        async def collect(conn):
+            async for event in conn.events():
+                if isinstance(event, SourceChanged):
+                    return event
+
+        async with self.helper.create_conn(**self.conn_kwargs) as conn:
+            collector = asyncio.create_task(collect(conn))
+            await asyncio.sleep(0)
+            await conn.send_command("SOURCE_TUNER")
+            event = await asyncio.wait_for(collector, 1.0)
+        self.assertEqual(event, SourceChanged("TUNER"))
+
+
+class AsyncTestMessageSubscription(IsolatedAsyncioTestCase):
+    async def test_drop_oldest(self):
+        subscription = MessageSubscription(max_depth=2)
+        for message in ("m1", "m2", "m3"):
+            subscription.put(message)  # type: ignore[arg-type]
+        self.assertEqual(subscription.dropped, 1)
+        subscription.close()
+        self.assertEqual([message async for message in subscription], ["m2", "m3"])
+
+    async def test_close_wakes_getter(self):
+        closed = []
+        subscription = MessageSubscription(on_close=closed.append)
+        getter = asyncio.create_task(subscription.get())
+        await asyncio.sleep(0)
+        with subscription:
+            pass
+        self.assertIsNone(await getter)
+        self.assertEqual(closed, [subscription])
+
+    async def test_drop_newest(self):
+        subscription = MessageSubscription(2, OverflowPolicy.DROP_NEWEST)
+        for message in ("m1", "m2", "m3"):
+            subscription.put(message)  # type: ignore[arg-type]
+        self.assertEqual(subscription.dropped, 1)
+        self.assertEqual([await subscription.get() for _ in range(2)], ["m1", "m2"])
+
+    async def test_keep_latest(self):
+        subscription = MessageSubscription(overflow=OverflowPolicy.KEEP_LATEST)
+        feedback1 = FeedbackMessage("CD", "", b"\x00" * 5)
+        trigger = TriggerMessage(b"\x00\x00")
+        smart1 = SmartDisplayMessage(["line 1"], 1)
+        smart2 = SmartDisplayMessage(["line 2"], 2)
+        feedback2 = FeedbackMessage("TUNER", "", b"\x00" * 5)
+        for message in (feedback1, trigger, smart1, smart2, feedback2):
+            subscription.put(message)
+        self.assertEqual(subscription.dropped, 1)
+        subscription.close()
+        self.assertEqual(
+            [message async for message in subscription],
+            [trigger, smart1, smart2, feedback2],
+        )
+
+    async def test_block(self):
+        paused = []
+        subscription = MessageSubscription(
+            2,
+            OverflowPolicy.BLOCK,
+            on_pause=paused.append,
+            on_resume=paused.remove,
+        )
+        for message in ("m1", "m2", "m3"):
+            subscription.put(message)  # type: ignore[arg-type]
+        self.assertEqual(paused, [subscription])
+        self.assertEqual(len(subscription), 3)
+        await subscription.get()
+        self.assertEqual(paused, [subscription])
+        await subscription.get()
+        self.assertEqual(paused, [])
+        self.assertEqual(subscription.dropped, 0)
+
+
+class TestReconnectPolicy(TestCase):
+    def test_delay(self):
+        policy = ReconnectPolicy(initial_delay=1.0, max_delay=8.0, jitter=0.25)
+        for attempt, expected in enumerate([1.0, 2.0, 4.0, 8.0, 8.0]):
+            delay = policy.delay(attempt)
+            self.assertGreaterEqual(delay, expected * 0.75)
+            self.assertLessEqual(delay, expected * 1.25)
+        self.assertLessEqual(policy.delay(10000), 10.0)
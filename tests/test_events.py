@@ -0,0 +1,116 @@
+from unittest import TestCase
+
+from rsp1570serial.events import (
+    AmpStateTracker,
+    IconsChanged,
+    MuteChanged,
+    PowerChanged,
+    SourceChanged,
+    VolumeChanged,
+    ZoneSourceChanged,
+    ZoneVolumeChanged,
+)
+from rsp1570serial.messages import FeedbackMessage
+
+OFF_LINE = "\x00" * 21
+INFO_LINE = "DOLBY PL\x19 C     48K  "
+FLAGS = b"\x00F\x08\x00\xfc"
+
+
+def feedback(line1, line2=INFO_LINE, flags=FLAGS):
+    return FeedbackMessage(line1, line2, flags)
+
+
+class TestAmpStateTracker(TestCase):
+    def setUp(self):
+        self.tracker = AmpStateTracker()
+
+    def test_first_message_reports_everything(self):
+        events = self.tracker.update(feedback("FIRE TV       VOL  64"))
+        self.assertEqual(
+            events[:4],
+            [
+                PowerChanged(True),
+                SourceChanged("FIRE TV"),
+                VolumeChanged(64),
+                MuteChanged(False),
+            ],
+        )
+        assert isinstance(events[-1], IconsChanged)
+        self.assertEqual(events[-1].icons_turned_off, [])
+        self.assertIn("HDMI", events[-1].icons_turned_on)
+
+    def test_repeated_message_reports_nothing(self):
+        self.tracker.update(feedback("FIRE TV       VOL  64"))
+        self.assertEqual(self.tracker.update(feedback("FIRE TV       VOL  64")), [])
+
+    def test_changes(self):
+        self.tracker.update(feedback("FIRE TV       VOL  64"))
+        self.assertEqual(
+            self.tracker.update(feedback("FIRE TV       VOL  65")), [VolumeChanged(65)]
+        )
+        self.assertEqual(
+            self.tracker.update(feedback("CATV          VOL  65")),
+            [SourceChanged("CATV")],
+        )
+
+    def test_mute_blink(self):
+        self.tracker.update(feedback("FIRE TV       VOL  64"))
+        self.assertEqual(
+            self.tracker.update(feedback("FIRE TV       MUTE ON")), [MuteChanged(True)]
+        )
+        self.assertEqual(self.tracker.update(feedback("FIRE TV              ")), [])
+        self.assertEqual(self.tracker.update(feedback("FIRE TV       MUTE ON")), [])
+        self.assertEqual(
+            self.tracker.update(feedback("FIRE TV       VOL  64")),
+            [MuteChanged(False)],
+        )
+
+    def test_power_off(self):
+        self.tracker.update(feedback("FIRE TV       VOL  64"))
+        self.assertEqual(
+            self.tracker.update(feedback(OFF_LINE, OFF_LINE, FLAGS)),
+            [PowerChanged(False)],
+        )
+
+    def test_zones(self):
+        self.tracker.update(feedback("FIRE TV       VOL  64"))
+        line1 = "FIRE TV       VOL  64"
+        self.assertEqual(
+            self.tracker.update(feedback(line1, "  ZONE2  TUNER       ")),
+            [ZoneSourceChanged(2, "TUNER")],
+        )
+        self.assertEqual(
+            self.tracker.update(feedback(line1, "  ZONE3 VOL   40     ")),
+            [ZoneVolumeChanged(3, 40)],
+        )
+        # Zone 2 source disappearing from line 2 is not a change
+        self.assertEqual(self.tracker.update(feedback(line1)), [])
+        self.assertEqual(
+            self.tracker.update(feedback(line1, "  ZONE2  TUNER       ")), []
+        )
+
+    def test_icons(self):
+        self.tracker.update(feedback("FIRE TV       VOL  64"))
+        events = self.tracker.update(
+            feedback("FIRE TV       VOL  64", flags=b"\x00\x06\x08\x00\xfc")
+        )
+        self.assertEqual(len(events), 1)
+        assert isinstance(events[0], IconsChanged)
+        self.assertEqual(events[0].icons_turned_off, ["Pro Logic"])
+        self.assertEqual(events[0].icons_turned_on, [])
+
+    def test_last_known(self):
+        self.assertIsNone(self.tracker.last_known("volume"))
+        self.tracker.update(feedback("FIRE TV       VOL  64"))
+        self.tracker.update(feedback("FIRE TV       MUTE ON"))
+        self.assertEqual(self.tracker.last_known("volume"), 64)
+        self.assertEqual(self.tracker.last_known("mute_on"), True)
+
+    def test_current_events(self):
+        self.assertEqual(self.tracker.current_events(), [])
+        first = self.tracker.update(feedback("FIRE TV       VOL  64"))
+        self.tracker.update(feedback("FIRE TV       MUTE ON"))
+        self.assertEqual(
+            self.tracker.current_events(), first[:3] + [MuteChanged(True)] + first[4:]
+        )
@@ -1,10 +1,16 @@
 from unittest import TestCase
 
 from rsp1570serial.icons import (
+    CATEGORY_MASKS,
+    DISPLAY_ICON_DEFINITIONS,
+    DisplayIcon,
     flags_to_icons,
+    flags_to_mask,
     icon_dict_to_flags,
     icon_list_to_flags,
     icons_that_are_on,
+    mask_to_flags,
+    mask_to_icons,
 )
 
 
@@ -78,3 +84,39 @@ class TestIcons(TestCase):
         flags = b"\x00\x00\x08\x00\x00"
         icon_list = icons_that_are_on(flags_to_icons(flags))
         self.assertCountEqual(icon_list, ["Standby LED"])
+
+    def test_display_icon_bits_match_definitions(self):
+        for d in DISPLAY_ICON_DEFINITIONS:
+            self.assertEqual(DisplayIcon[d.name[len("rsp1570_") :].upper()], d.mask)
+
+    def test_mask(self):
+        flags = b"\x00F\x08\x00\xfc"
+        mask = flags_to_mask(flags)
+        self.assertEqual(mask_to_flags(mask), flags)
+        self.assertTrue(mask & DisplayIcon.INPUT_HDMI)
+        self.assertFalse(mask & DisplayIcon.INPUT_OPTICAL)
+        self.assertEqual(
+            mask_to_icons(mask),
+            [
+                "II",
+                "HDMI",
+                "Pro Logic",
+                "Standby LED",
+                "SW",
+                "SR",
+                "SL",
+                "FR",
+                "C",
+                "FL",
+            ],
+        )
+        self.assertEqual(
+            mask_to_icons(mask & CATEGORY_MASKS["speaker_icons"]),
+            ["SW", "SR", "SL", "FR", "C", "FL"],
+        )
+
+    def test_mask_changes(self):
+        before = flags_to_mask(b"\x00F\x08\x00\xfc")
+        after = flags_to_mask(b"\x00\x06\x08\x00\xfc")
+        self.assertEqual(before ^ after, DisplayIcon.SOUND_MODE_PRO_LOGIC)
+        self.assertEqual(mask_to_icons(before ^ after), ["Pro Logic"])
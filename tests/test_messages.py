@@ -1,7 +1,11 @@
 import logging
+import pickle
+import time
+from dataclasses import FrozenInstanceError
 from unittest import IsolatedAsyncioTestCase, TestCase
 
 from rsp1570serial.message_types import (
+    MSGTYPE_FEEDBACK_STRING,
     MSGTYPE_PRIMARY_COMMANDS,
     MSGTYPE_TRIGGER_SMART_DISPLAY_STRING_1,
     MSGTYPE_TRIGGER_SMART_DISPLAY_STRING_2,
@@ -9,14 +13,27 @@ from rsp1570serial.message_types import (
     MSGTYPE_ZONE_3_COMMANDS,
 )
 from rsp1570serial.messages import (
+    MESSAGE_HANDLERS,
+    CommandMessage,
     FeedbackMessage,
     MessageCodec,
+    RotelMessageError,
     SmartDisplayMessage,
+    command_message_handler,
     decode_smart_display_line,
+    get_message_handler,
+    register_message_handler,
     smart_display_string_1_handler,
     smart_display_string_2_handler,
 )
-from rsp1570serial.protocol import AnyAsyncReader, StreamProxy
+from rsp1570serial.protocol import (
+    AnyAsyncReader,
+    FrameParser,
+    StreamProxy,
+    decode_protocol_buffer,
+    encode_many,
+    encode_payload,
+)
 from rsp1570serial.rotel_model_meta import RSP1570_META, RSP1572_META
 
 
@@ -464,6 +481,253 @@ class AsyncRotelTestMessages(IsolatedAsyncioTestCase):
             ],
         )
 
+    async def test_decode_stream_with_resync(self):
+        """
+        Deliberately truncate first message.
+        In resync mode the unescaped start byte begins the next message.
+        """
+        ser = StreamProxy(
+            b"\xfe1\xa3 FIRE TV       VOL  64DOLBY PL\x19 C     48K  \x00F\x08\x00\xfc\xfe1\xa3 CATV          VOL  63DOLBY PL\x19 M     48K  \x00F\x08\x00\xfc\x99"
+        )
+        messages = []
+        with self.assertLogs(level=logging.INFO) as cm:
+            async for message in self.codec.decode_message_stream(ser, resync=True):
+                messages.append(message)
+        self.assertEqual(len(messages), 1)
+        assert isinstance(messages[0], FeedbackMessage)
+        self.assertEqual(messages[0].lines[0], "CATV          VOL  63")
+        self.assertEqual(
+            cm.output,
+            [
+                "ERROR:rsp1570serial.protocol:Unexpected START_BYTE encountered while processing message content.  Work in progress discarded: bytearray(b'1\\xa3 FIRE TV       VOL  64DOLBY PL\\x19 C     48K  \\x00F\\x08\\x00\\xfc')",
+            ],
+        )
+
+    async def test_stats(self):
+        ser = StreamProxy(
+            self.codec.encode_command("POWER_TOGGLE")
+            + self.codec.encode_command("VOLUME_40")
+            + self.codec.encode_command("POWER_TOGGLE")
+            + encode_payload(b"\xa5\x10\x0a")  # Wrong device id
+            + encode_payload(b"\xa3\x99\x0a")  # Unknown message type
+            + b"\xfe\x03\xa3\x10\x0a\xc1"  # Bad checksum
+        )
+        with self.assertLogs(level=logging.ERROR):
+            messages = await decode_all_messages(self.codec, ser)
+        self.assertEqual(len(messages), 3)
+        self.assertEqual(
+            self.codec.stats.messages_by_type,
+            {MSGTYPE_PRIMARY_COMMANDS: 2, MSGTYPE_VOLUME_DIRECT_COMMANDS: 1},
+        )
+        self.assertEqual(self.codec.stats.device_id_mismatches, 1)
+        self.assertEqual(self.codec.stats.unknown_message_types, 1)
+        self.assertEqual(self.codec.protocol_stats.messages, 5)
+        self.assertEqual(self.codec.protocol_stats.checksum_errors, 1)
+
+    async def test_timestamps(self):
+        ser = StreamProxy(self.codec.encode_command("POWER_TOGGLE"))
+        before = time.monotonic()
+        message = await decode_single_message(self.codec, ser)
+        after = time.monotonic()
+        assert message.start_time is not None and message.end_time is not None
+        self.assertTrue(before <= message.start_time <= message.end_time <= after)
+
+    def test_decode_untimed_payload(self):
+        message = self.codec.decode_message(b"\xa3\x10\x0a")
+        self.assertIsNone(message.start_time)
+        self.assertIsNone(message.end_time)
+
+    async def test_decode_stream_with_duplicate_window(self):
+        line2_and_flags = b"DOLBY PL\x19 C     48K  \x00F\x08\x00\xfc"
+        mute_on = b"\xa3\x20FIRE TV       MUTE ON" + line2_and_flags
+        blank = b"\xa3\x20FIRE TV              " + line2_and_flags
+        ser = StreamProxy(encode_payload(mute_on) + encode_payload(blank) * 3)
+        messages = []
+        async for message in self.codec.decode_message_stream(
+            ser, duplicate_window=60.0
+        ):
+            messages.append(message)
+        self.assertEqual(len(messages), 2)
+        self.assertEqual(self.codec.stats.duplicates_suppressed, 2)
+        self.assertEqual(self.codec.stats.messages_by_type[MSGTYPE_FEEDBACK_STRING], 2)
+
+
+class MessageHandlerRegistryTest(TestCase):
+    UNKNOWN_PAYLOAD = b"\xa3\x99\x0a"
+
+    def test_unknown_message_type_is_skipped(self):
+        codec = MessageCodec(RSP1570_META)
+        with self.assertLogs(level=logging.DEBUG) as cm:
+            self.assertIsNone(codec.try_decode_message(self.UNKNOWN_PAYLOAD))
+        self.assertEqual(
+            cm.output,
+            [
+                "DEBUG:rsp1570serial.messages:Skipping message of unknown type 99: b'\\xa3\\x99\\n'"
+            ],
+        )
+        self.assertEqual(codec.stats.unknown_message_types, 1)
+        with self.assertRaises(RotelMessageError):
+            codec.decode_message(self.UNKNOWN_PAYLOAD)
+
+    def test_register_message_handler(self):
+        self.addCleanup(MESSAGE_HANDLERS.pop, 0x99)
+        register_message_handler(0x99, command_message_handler)
+        message = MessageCodec(RSP1570_META).decode_message(self.UNKNOWN_PAYLOAD)
+        assert isinstance(message, CommandMessage)
+        self.assertEqual(message.key, b"\x0a")
+        self.assertIs(get_message_handler(0x99), command_message_handler)
+
+    def test_codec_message_handlers(self):
+        codec = MessageCodec(
+            RSP1570_META,
+            message_handlers={**MESSAGE_HANDLERS, 0x99: command_message_handler},
+        )
+        message = codec.decode_message(self.UNKNOWN_PAYLOAD)
+        self.assertIsInstance(message, CommandMessage)
+        with self.assertRaises(RotelMessageError):
+            MessageCodec(RSP1570_META).decode_message(self.UNKNOWN_PAYLOAD)
+
+
+class FeedbackMessageTest(TestCase):
+    DATA = b"FIRE TV       VOL  64DOLBY PL\x19 C     48K  \x00F\x08\x00\xfc"
+
+    def test_lazy_decode(self):
+        message = FeedbackMessage.from_data(self.DATA)
+        self.assertIsNone(message._decoded.lines)
+        self.assertIsNone(message._decoded.icons)
+        self.assertEqual(message.parse_display_lines()["volume"], 64)
+        self.assertIsNone(message._decoded.icons)
+        self.assertEqual(message.lines[0], "FIRE TV       VOL  64")
+        self.assertIs(message.lines, message.lines)
+        self.assertEqual(message.flags, b"\x00F\x08\x00\xfc")
+        self.assertTrue(message.icons["HDMI"])
+
+    def test_display_state_is_cached_but_copied(self):
+        message = FeedbackMessage.from_data(self.DATA)
+        fields = message.parse_display_lines()
+        fields["volume"] = 0
+        self.assertEqual(message.parse_display_lines()["volume"], 64)
+
+    def test_display_state(self):
+        message = FeedbackMessage.from_data(self.DATA)
+        state = message.display_state
+        self.assertIs(message.display_state, state)
+        self.assertEqual(state.source_name, "FIRE TV")
+        self.assertEqual(state.volume, 64)
+        self.assertEqual(message.parse_display_lines()["info"], state.info)
+        other = FeedbackMessage.from_data(self.DATA).display_state
+        self.assertIsNot(other, state)
+        self.assertEqual(other, state)
+        self.assertEqual(len({state, other}), 1)
+        with self.assertRaises(FrozenInstanceError):
+            state.volume = 0  # type: ignore[misc]
+        self.assertEqual(pickle.loads(pickle.dumps(state)), state)
+
+    def test_data_from_lines(self):
+        message = FeedbackMessage(
+            "FIRE TV       VOL  64", "DOLBY PL\x19 C     48K  ", b"\x00F\x08\x00\xfc"
+        )
+        self.assertEqual(message.data, self.DATA)
+
+    def test_pickle(self):
+        message = FeedbackMessage.from_data(self.DATA)
+        self.assertTrue(message.icons["HDMI"])
+        copy = pickle.loads(pickle.dumps(message))
+        self.assertEqual(copy.lines, message.lines)
+        self.assertEqual(copy.icons, message.icons)
+        self.assertEqual(copy.display_state, message.display_state)
+
+    def test_slots(self):
+        message = FeedbackMessage.from_data(self.DATA)
+        with self.assertRaises(AttributeError):
+            message.unknown = True  # type: ignore[attr-defined]
+
+
+class DecodeCacheTest(TestCase):
+    PAYLOAD = b"\xa3\x20FIRE TV       VOL  64DOLBY PL\x19 C     48K  \x00F\x08\x00\xfc"
+
+    def test_repeated_payload_shares_state(self):
+        codec = MessageCodec(RSP1570_META)
+        parser = FrameParser()
+        frame = encode_payload(self.PAYLOAD)
+        first, second = parser.feed(frame, now=1.0) + parser.feed(frame, now=2.0)
+        assert isinstance(first, bytes) and isinstance(second, bytes)
+        message1 = codec.decode_message(first)
+        assert isinstance(message1, FeedbackMessage)
+        state = message1.display_state
+        message2 = codec.decode_message(second)
+        assert isinstance(message2, FeedbackMessage)
+        self.assertIsNot(message1, message2)
+        self.assertEqual((message1.start_time, message2.start_time), (1.0, 2.0))
+        # State that was already decoded is shared
+        self.assertIs(message2.display_state, state)
+        self.assertEqual(codec.stats.decode_cache_hits, 1)
+        self.assertEqual(codec.stats.messages_by_type[MSGTYPE_FEEDBACK_STRING], 2)
+
+    def test_state_decoded_by_a_copy_is_shared(self):
+        codec = MessageCodec(RSP1570_META)
+        messages = [codec.decode_message(self.PAYLOAD) for _ in range(3)]
+        for message in messages:
+            assert isinstance(message, FeedbackMessage)
+        # Decoded on the second message, which is a cache hit
+        state = messages[1].display_state
+        self.assertIs(messages[0].display_state, state)
+        self.assertIs(messages[2].display_state, state)
+        self.assertIs(messages[0].lines, messages[2].lines)
+        self.assertEqual(codec.stats.decode_cache_hits, 2)
+
+    def test_lru(self):
+        codec = MessageCodec(RSP1570_META, decode_cache_size=2)
+        for key in [0x0A, 0x0B, 0x0A, 0x0C, 0x0A, 0x0B]:
+            codec.decode_message(bytes([0xA3, MSGTYPE_PRIMARY_COMMANDS, key]))
+        # 0x0B was evicted by 0x0C
+        self.assertEqual(codec.stats.decode_cache_hits, 2)
+
+    def test_disabled(self):
+        codec = MessageCodec(RSP1570_META, decode_cache_size=0)
+        codec.decode_message(self.PAYLOAD)
+        codec.decode_message(self.PAYLOAD)
+        self.assertEqual(codec.stats.decode_cache_hits, 0)
+        self.assertEqual(len(codec._decode_cache), 0)
+
+    def test_cache_hit_is_lazy(self):
+        # The display can't be parsed but that only matters when it is used
+        payload = self.PAYLOAD.replace(b"VOL  64", b"VOL  --")
+        codec = MessageCodec(RSP1570_META)
+        for _ in range(2):
+            message = codec.try_decode_message(payload)
+            assert isinstance(message, FeedbackMessage)
+            self.assertEqual(message.lines[0], "FIRE TV       VOL  --")
+            with self.assertRaises(ValueError):
+                message.display_state
+        self.assertEqual(codec.stats.decode_cache_hits, 1)
+
+    def test_cached_messages_are_read_only(self):
+        codec = MessageCodec(RSP1570_META)
+        message = codec.decode_message(self.PAYLOAD)
+        assert isinstance(message, FeedbackMessage)
+        self.assertIsInstance(message.lines, tuple)
+        with self.assertRaises(TypeError):
+            message.icons["HDMI"] = False  # type: ignore[index]
+
+
+class DecodeProtocolBufferTest(TestCase):
+    def test_decode_buffer_payloads(self):
+        frames = encode_many([DecodeCacheTest.PAYLOAD, b"\xa3\x10\x0a"] * 2)
+        for buf in (frames, bytearray(frames)):
+            with self.subTest(type(buf).__name__):
+                codec = MessageCodec(RSP1570_META)
+                messages = [
+                    codec.decode_message(p) for p in decode_protocol_buffer(buf)
+                ]
+                self.assertEqual(codec.stats.decode_cache_hits, 2)
+                for message in messages[::2]:
+                    assert isinstance(message, FeedbackMessage)
+                    self.assertEqual(message.lines[0], "FIRE TV       VOL  64")
+                    self.assertEqual(message.display_state.volume, 64)
+                for message in messages[1::2]:
+                    assert isinstance(message, CommandMessage)
+
 
 class SmartMessageDecoderTest(TestCase):
     def test1(self):
@@ -502,6 +766,21 @@ class SmartMessageDecoderTest(TestCase):
             "\N{BLACK MEDIUM SQUARE} 00:00 \N{NEGATIVE CIRCLED LATIN CAPITAL LETTER T}000/000",
         )
 
+    def test6(self):
+        line = b"\x87 01:23 \x8c\x86\x86"
+        expected = (
+            "\N{BLACK MEDIUM RIGHT-POINTING TRIANGLE} 01:23 \N{LEFTWARDS ARROW}"
+            "\N{BOX DRAWINGS LIGHT HORIZONTAL}\N{BOX DRAWINGS LIGHT HORIZONTAL}"
+        )
+        self.assertEqual(decode_smart_display_line(line), expected)
+        self.assertEqual(decode_smart_display_line(bytearray(line)), expected)
+        self.assertEqual(decode_smart_display_line(memoryview(line)), expected)
+
+    def test7(self):
+        # Unmapped bytes are still passed to the UTF-8 decoder
+        line = "Caf\N{LATIN SMALL LETTER E WITH ACUTE}"
+        self.assertEqual(decode_smart_display_line(line.encode("utf-8")), line)
+
 
 class SmarSmartDisplayMessageTest(TestCase):
     def test1(self):
@@ -519,7 +798,7 @@ class SmarSmartDisplayMessageTest(TestCase):
     def test2(self):
         data = b"\x00\x00" + b"12345678901234567890123456"
         m = smart_display_string_1_handler(MSGTYPE_TRIGGER_SMART_DISPLAY_STRING_1, data)
-        self.assertEqual(m.lines, ["12345678901234567890123456"])
+        self.assertEqual(m.lines, ("12345678901234567890123456",))
         self.assertEqual(m.start, 1)
 
     def test3(self):
@@ -537,7 +816,7 @@ class SmarSmartDisplayMessageTest(TestCase):
         m = smart_display_string_2_handler(MSGTYPE_TRIGGER_SMART_DISPLAY_STRING_2, data)
         self.assertEqual(
             m.lines,
-            [
+            (
                 "Line 2",
                 "Line 3",
                 "Line 4",
@@ -547,6 +826,6 @@ class SmarSmartDisplayMessageTest(TestCase):
                 "Line 8",
                 "Line 9",
                 "Line 10",
-            ],
+            ),
         )
         self.assertEqual(m.start, 2)
@@ -1,7 +1,12 @@
-from unittest import IsolatedAsyncioTestCase
+import asyncio
+from unittest import IsolatedAsyncioTestCase, TestCase
 
 from rsp1570serial.messages import FeedbackMessage
-from rsp1570serial.process_command import process_command
+from rsp1570serial.process_command import (
+    confirmation_predicate,
+    process_command,
+    send_and_confirm,
+)
 from rsp1570serial.rotel_model_meta import RSP1570_META
 from tests.emulator_test_helper import EmulatorTestHelper
 
@@ -48,3 +53,67 @@ class AsyncTestProcessCommandFromOn(IsolatedAsyncioTestCase):
         self.assertEqual(len(messages), 1)
         assert isinstance(messages[0], FeedbackMessage)
         self.assertEqual(messages[0].lines[0], "CD ALIAS      VOL  50")
+
+    async def test_send_and_confirm_source(self):
+        loop = asyncio.get_running_loop()
+        async with self.helper.create_conn() as conn:
+            start = loop.time()
+            message = await send_and_confirm(conn, "SOURCE_CD")
+            self.assertLess(loop.time() - start, 0.5)
+        self.assertEqual(message.display_state.source_name, "CD ALIAS")
+
+    async def test_send_and_confirm_mute_and_volume(self):
+        async with self.helper.create_conn() as conn:
+            message = await send_and_confirm(conn, "MUTE_TOGGLE")
+            self.assertTrue(message.display_state.mute_on)
+            message = await send_and_confirm(conn, "VOLUME_UP")
+            self.assertEqual(message.display_state.volume, 51)
+            message = await send_and_confirm(conn, "VOLUME_UP")
+            self.assertEqual(message.display_state.volume, 52)
+
+    async def test_send_and_confirm_timeout(self):
+        async with self.helper.create_conn() as conn:
+            with self.assertRaises(asyncio.TimeoutError):
+                await send_and_confirm(
+                    conn, "SOURCE_CD", predicate=lambda message: False, timeout=0.2
+                )
+
+
+def feedback(line1: str) -> FeedbackMessage:
+    return FeedbackMessage(line1, " " * 21, b"\x00" * 5)
+
+
+class TestConfirmationPredicate(TestCase):
+    def test_source(self):
+        known = {"source_name": "TUNER"}
+        predicate = confirmation_predicate("SOURCE_CD", known.get)
+        self.assertFalse(predicate(feedback("TUNER         VOL  50")))
+        self.assertTrue(predicate(feedback(" CD           VOL  50")))
+
+    def test_volume(self):
+        known = {"volume": 50}
+        predicate = confirmation_predicate("MAIN_ZONE_VOLUME_UP", known.get)
+        self.assertFalse(predicate(feedback("TUNER         VOL  50")))
+        self.assertTrue(predicate(feedback("TUNER         VOL  51")))
+        predicate = confirmation_predicate("VOLUME_32", known.get)
+        self.assertFalse(predicate(feedback("TUNER         VOL  51")))
+        self.assertTrue(predicate(feedback("TUNER         VOL  32")))
+
+    def test_mute(self):
+        known = {"mute_on": True}
+        predicate = confirmation_predicate("MUTE_TOGGLE", known.get)
+        # Neither half of the mute blink confirms unmuting
+        self.assertFalse(predicate(feedback("TUNER         MUTE ON")))
+        self.assertFalse(predicate(feedback("TUNER                ")))
+        self.assertTrue(predicate(feedback("TUNER         VOL  50")))
+
+    def test_unknown_previous_value(self):
+        predicate = confirmation_predicate("VOLUME_UP", {}.get)
+        # Only a message that shows a volume confirms the change
+        self.assertFalse(predicate(feedback("TUNER         MUTE ON")))
+        self.assertFalse(predicate(feedback(" " * 21)))
+        self.assertTrue(predicate(feedback("TUNER         VOL  50")))
+
+    def test_other(self):
+        predicate = confirmation_predicate("DISPLAY_REFRESH", {}.get)
+        self.assertTrue(predicate(feedback("TUNER         VOL  50")))
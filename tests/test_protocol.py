@@ -1,10 +1,22 @@
+import logging
+import time
 from unittest import IsolatedAsyncioTestCase, TestCase
 
 from rsp1570serial.protocol import (
+    MAX_UNEXPECTED_BYTES_LOGGED,
+    DuplicatePayloadFilter,
+    FrameParser,
     ProtocolDecoder,
+    ProtocolStats,
+    RotelProtocolError,
     StreamProxy,
+    TimestampedPayload,
     calculate_checksum,
+    decode_protocol_buffer,
+    decode_protocol_stream,
+    encode_many,
     encode_payload,
+    meta_escape,
 )
 
 
@@ -34,6 +46,25 @@ class RotelTestProtocol(TestCase):
             encode_payload(b"\xa3\x33\x24"), b"\xfe\x03\xa3\x33\x24\xfd\x00"
         )
 
+    def test_meta_escape(self):
+        self.assertEqual(
+            meta_escape([0x01, 0xFD, 0xFE, 0x02, 0xFE, 0xFD]),
+            b"\x01\xfd\x00\xfd\x01\x02\xfd\x01\xfd\x00",
+        )
+
+    def test_encode_many(self):
+        payloads = [b"\xa3\x10\x0a", [0xA3, 0x30, 0x28], b"\xa3\xfd\xfe"]
+        self.assertEqual(
+            encode_many(payloads),
+            b"\xfe\x03\xa3\x10\x0a\xc0"
+            b"\xfe\x03\xa3\x30\x28\xfd\x01"
+            b"\xfe\x03\xa3\xfd\x00\xfd\x01\xa1",
+        )
+        self.assertEqual(
+            FrameParser().feed(encode_many(payloads)),
+            [bytes(payload) for payload in payloads],
+        )
+
 
 class AsyncRotelTestProtocol(IsolatedAsyncioTestCase):
     async def test_encode_decode_with_meta(self):
@@ -41,3 +72,291 @@ class AsyncRotelTestProtocol(IsolatedAsyncioTestCase):
         decoder = ProtocolDecoder(StreamProxy(message))
         data = await decoder.read_payload()
         self.assertEqual(data, b"\xa3\x30\x28")
+
+    async def test_buffered_decode_multiple_messages(self):
+        stream = (
+            b"junk" + encode_payload(b"\xa3\x30\x28") + encode_payload(b"\xa3\x10\x0a")
+        )
+        decoder = ProtocolDecoder(StreamProxy(stream), read_size=1024)
+        with self.assertLogs(level=logging.WARNING) as cm:
+            data1 = await decoder.read_payload()
+        data2 = await decoder.read_payload()
+        self.assertEqual(data1, b"\xa3\x30\x28")
+        self.assertEqual(data2, b"\xa3\x10\x0a")
+        self.assertEqual(decoder.bytes_received, len(stream))
+        self.assertEqual(
+            cm.output,
+            [
+                "WARNING:rsp1570serial.protocol:4 unexpected bytes encountered while waiting for START_BYTE: bytearray(b'junk')"
+            ],
+        )
+
+    async def test_buffered_decode_stream_matches_unbuffered(self):
+        stream = b"".join(
+            encode_payload(bytes([0xA3, 0x30, volume])) for volume in range(0x60)
+        )
+        unbuffered = [p async for p in decode_protocol_stream(StreamProxy(stream))]
+        buffered = [
+            p async for p in decode_protocol_stream(StreamProxy(stream), read_size=7)
+        ]
+        self.assertEqual(len(buffered), 0x60)
+        self.assertEqual(buffered, unbuffered)
+
+
+class RotelTestFrameParser(TestCase):
+    def setUp(self) -> None:
+        self.stream = (
+            encode_payload(b"\xa3\x30\x28")
+            + encode_payload(b"\xa3\x33\x24")
+            + encode_payload(b"\xa3\x10\x0a")
+        )
+        self.payloads = [b"\xa3\x30\x28", b"\xa3\x33\x24", b"\xa3\x10\x0a"]
+
+    def test_feed_all_at_once(self):
+        parser = FrameParser()
+        self.assertEqual(parser.feed(self.stream), self.payloads)
+        self.assertEqual(parser.close(), [])
+        self.assertEqual(parser.bytes_received, len(self.stream))
+
+    def test_feed_byte_by_byte(self):
+        parser = FrameParser()
+        events = []
+        for i in range(len(self.stream)):
+            events.extend(parser.feed(self.stream[i : i + 1]))
+        self.assertEqual(events, self.payloads)
+
+    def test_feed_byte(self):
+        stream = (
+            b"ab"
+            + self.stream
+            + b"\xfe\x03\xa3\x10\x0a\xc1"  # Bad checksum
+            + b"\xfe\x03\xa3\x30\xfd\x02"  # Bad escape
+            + self.stream[:3]  # Unexpected start byte
+            + encode_payload(b"\xa3\xfd\xfe")  # Escapes
+        )
+        for resync in (False, True):
+            with self.subTest(resync=resync):
+                by_chunk, by_byte = FrameParser(resync), FrameParser(resync)
+                expected = []
+                events = []
+                with self.assertLogs(level=logging.WARNING):
+                    for i, c in enumerate(stream):
+                        expected.extend(by_chunk.feed(stream[i : i + 1], now=i))
+                        event = by_byte.feed_byte(c, now=i)
+                        if event is not None:
+                            events.append(event)
+                self.assertEqual(
+                    [(type(e), str(e)) for e in events],
+                    [(type(e), str(e)) for e in expected],
+                )
+                self.assertEqual(
+                    [
+                        (e.start_time, e.end_time)
+                        for e in events
+                        if isinstance(e, bytes)
+                    ],
+                    [
+                        (e.start_time, e.end_time)
+                        for e in expected
+                        if isinstance(e, TimestampedPayload)
+                    ],
+                )
+                self.assertEqual(by_byte.stats, by_chunk.stats)
+                self.assertEqual(by_byte.bytes_received, len(stream))
+
+    def test_invalid_checksum(self):
+        parser = FrameParser()
+        events = parser.feed(b"\xfe\x03\xa3\x10\x0a\xc1" + self.stream)
+        self.assertEqual(len(events), 4)
+        self.assertIsInstance(events[0], RotelProtocolError)
+        self.assertTrue(str(events[0]).startswith("Invalid checksum."))
+        self.assertEqual(events[1:], self.payloads)
+
+    def test_invalid_escape(self):
+        parser = FrameParser()
+        events = parser.feed(b"\xfe\x03\xa3\x30\xfd\x02" + self.stream)
+        self.assertEqual(len(events), 4)
+        self.assertEqual(
+            str(events[0]),
+            "Invalid byte encountered while processing message content.  Work in progress discarded: bytearray(b'\\x03\\xa30')",
+        )
+        self.assertEqual(events[1:], self.payloads)
+
+    def test_eof_in_message(self):
+        parser = FrameParser()
+        self.assertEqual(parser.feed(self.stream[:-1]), self.payloads[:2])
+        events = parser.close()
+        self.assertEqual(len(events), 1)
+        self.assertEqual(
+            str(events[0]),
+            "Unexpected EOF encountered.  Work in progress discarded: bytearray(b'\\x03\\xa3\\x10\\n')",
+        )
+
+    def test_junk(self):
+        parser = FrameParser()
+        with self.assertLogs(level=logging.WARNING) as cm:
+            events = parser.feed(b"ab" + self.stream + b"cd")
+            events.extend(parser.close())
+        self.assertEqual(events, self.payloads)
+        self.assertEqual(
+            cm.output,
+            [
+                "WARNING:rsp1570serial.protocol:2 unexpected bytes encountered while waiting for START_BYTE: bytearray(b'ab')",
+                "WARNING:rsp1570serial.protocol:2 unexpected bytes discarded when EOF encountered: bytearray(b'cd')",
+            ],
+        )
+
+    def test_unexpected_start_byte(self):
+        parser = FrameParser()
+        events = parser.feed(self.stream[:3] + self.stream)
+        self.assertEqual(len(events), 3)
+        self.assertIsInstance(events[0], RotelProtocolError)
+        self.assertEqual(events[1:], self.payloads[1:])
+
+    def test_unexpected_start_byte_with_resync(self):
+        parser = FrameParser(resync=True)
+        events = parser.feed(self.stream[:3] + self.stream)
+        self.assertEqual(len(events), 4)
+        self.assertEqual(
+            str(events[0]),
+            "Unexpected START_BYTE encountered while processing message content.  Work in progress discarded: bytearray(b'\\x03\\xa3')",
+        )
+        self.assertEqual(events[1:], self.payloads)
+
+    def test_unexpected_bytes_are_capped(self):
+        parser = FrameParser()
+        junk = b"\x00" * (MAX_UNEXPECTED_BYTES_LOGGED * 4)
+        with self.assertLogs(level=logging.WARNING) as cm:
+            for i in range(0, len(junk), 100):
+                parser.feed(junk[i : i + 100])
+            events = parser.feed(self.stream)
+        self.assertEqual(events, self.payloads)
+        self.assertEqual(
+            cm.output,
+            [
+                "WARNING:rsp1570serial.protocol:{} unexpected bytes encountered while waiting for START_BYTE: {!r}".format(
+                    len(junk), bytearray(MAX_UNEXPECTED_BYTES_LOGGED)
+                )
+            ],
+        )
+
+    def test_stats(self):
+        parser = FrameParser()
+        with self.assertLogs(level=logging.WARNING):
+            parser.feed(
+                b"ab"
+                + self.stream
+                + b"\xfe\x03\xa3\x10\x0a\xc1"  # Bad checksum
+                + b"\xfe\x03\xa3\x30\xfd\x02"  # Bad escape
+                + self.stream[:3]
+                + self.stream[:-1]
+            )
+            parser.close()
+        self.assertEqual(
+            parser.stats,
+            ProtocolStats(
+                messages=4,
+                checksum_errors=1,
+                invalid_escapes=1,
+                unexpected_start_bytes=1,
+                truncated_messages=1,
+                junk_bytes=8,
+            ),
+        )
+
+    def test_timestamps(self):
+        parser = FrameParser()
+        # First message split across two chunks, second (escaped) within the second
+        split = 3
+        events = parser.feed(self.stream[:split], now=10.0)
+        events.extend(parser.feed(self.stream[split:14], now=10.5))
+        self.assertEqual(events, self.payloads[:2])
+        assert isinstance(events[0], TimestampedPayload)
+        self.assertEqual((events[0].start_time, events[0].end_time), (10.0, 10.5))
+        self.assertEqual(events[0].receive_duration, 0.5)
+        assert isinstance(events[1], TimestampedPayload)
+        self.assertEqual((events[1].start_time, events[1].end_time), (10.5, 10.5))
+
+    def test_default_timestamps_are_monotonic(self):
+        parser = FrameParser()
+        before = time.monotonic()
+        events = parser.feed(self.stream)
+        after = time.monotonic()
+        for event in events:
+            assert isinstance(event, TimestampedPayload)
+            self.assertTrue(before <= event.start_time <= event.end_time <= after)
+
+
+class RotelTestDecodeProtocolBuffer(TestCase):
+    def test_zero_copy(self):
+        buf = b"junk" + encode_many(
+            [b"\xa3\x10\x0a", b"\xa3\x30\x28", b"\xa3\x10\x1e", b"\xa3\x10\x0a"]
+        )
+        with self.assertLogs(level=logging.WARNING):
+            payloads = decode_protocol_buffer(buf)
+        self.assertEqual(
+            [bytes(p) for p in payloads],
+            [b"\xa3\x10\x0a", b"\xa3\x30\x28", b"\xa3\x10\x1e", b"\xa3\x10\x0a"],
+        )
+        self.assertIsInstance(payloads[0], memoryview)
+        self.assertIsInstance(payloads[1], bytes)  # Escaped checksum
+        self.assertIsInstance(payloads[2], memoryview)
+        self.assertIsInstance(payloads[3], memoryview)
+        assert isinstance(payloads[0], memoryview)
+        self.assertIs(payloads[0].obj, buf)
+
+    def test_matches_frame_parser(self):
+        buf = (
+            b"\x00"
+            + encode_payload(b"\xa3\x10\x0a")
+            + b"\xfe\x03\xa3\x10\x0a\xc1"  # Bad checksum
+            + b"\xfe\x03\xa3\x30\xfd\x02"  # Bad escape
+            + encode_payload(b"\xa3\x33\x24")
+            + encode_payload(b"\xa3\x10\x0a")[:4]  # Truncated
+            + encode_payload(b"\xa3\x30\x28")
+            + b"\xfe\x03\xa3"  # EOF
+        )
+        with self.assertLogs(level=logging.WARNING) as cm:
+            payloads = decode_protocol_buffer(buf)
+            parser = FrameParser()
+            events = parser.feed(buf[:10]) + parser.feed(buf[10:]) + parser.close()
+        self.assertEqual(len(payloads), 2)
+        self.assertEqual(
+            [bytes(p) for p in payloads],
+            [e for e in events if not isinstance(e, RotelProtocolError)],
+        )
+        errors = [str(e) for e in events if isinstance(e, RotelProtocolError)]
+        self.assertEqual(len(errors), 4)
+        self.assertEqual(
+            [r.getMessage() for r in cm.records if r.levelno == logging.ERROR],
+            errors,
+        )
+
+
+class RotelTestDuplicatePayloadFilter(TestCase):
+    def test_window(self):
+        duplicate_filter = DuplicatePayloadFilter(1.5)
+        blink = [b"\xa3\x20on", b"\xa3\x20off"]
+        results = [
+            duplicate_filter.is_duplicate(blink[i % 2], now=i * 0.5) for i in range(6)
+        ]
+        # Each payload gets through at most once every 1.5 seconds
+        self.assertEqual(results, [False, False, True, True, False, False])
+
+    def test_timestamped_payloads(self):
+        parser = FrameParser()
+        duplicate_filter = DuplicatePayloadFilter(1.0)
+        frame = encode_payload(b"\xa3\x10\x0a")
+        payloads = parser.feed(frame, now=0.0) + parser.feed(frame, now=0.5)
+        payloads += parser.feed(frame, now=1.0)
+        results = []
+        for payload in payloads:
+            assert isinstance(payload, bytes)
+            results.append(duplicate_filter.is_duplicate(payload))
+        self.assertEqual(results, [False, True, False])
+
+    def test_prune(self):
+        duplicate_filter = DuplicatePayloadFilter(1.0)
+        for i in range(1000):
+            duplicate_filter.is_duplicate(i.to_bytes(2, "big"), now=float(i))
+        self.assertLess(len(duplicate_filter._last_passed), 300)
@@ -0,0 +1,65 @@
+from unittest import TestCase
+
+from rsp1570serial.message_types import (
+    MSGTYPE_TRIGGER_SMART_DISPLAY_STRING_1,
+    MSGTYPE_TRIGGER_SMART_DISPLAY_STRING_2,
+)
+from rsp1570serial.messages import (
+    smart_display_string_1_handler,
+    smart_display_string_2_handler,
+)
+from rsp1570serial.smart_display import (
+    NowPlaying,
+    PlayState,
+    SmartDisplayState,
+    parse_now_playing_line,
+)
+
+
+def lines_2_10(now_playing: bytes, title: bytes = b"\x82 No Song"):
+    lines = [now_playing, title] + [b""] * 7
+    data = b"".join(line.ljust(26) for line in lines)
+    return smart_display_string_2_handler(MSGTYPE_TRIGGER_SMART_DISPLAY_STRING_2, data)
+
+
+class TestSmartDisplayState(TestCase):
+    def setUp(self):
+        self.state = SmartDisplayState()
+
+    def test_update(self):
+        line1 = smart_display_string_1_handler(
+            MSGTYPE_TRIGGER_SMART_DISPLAY_STRING_1,
+            b"\x00\x00      iPod/USB PLAYER     ",
+        )
+        self.assertEqual(self.state.update(line1), [1])
+        self.assertEqual(self.state.line(1), "      iPod/USB PLAYER")
+        self.assertEqual(self.state.update(line1), [])
+        self.assertEqual(
+            self.state.update(lines_2_10(b"\x87 00:01 \x82001/012")), [2, 3]
+        )
+        self.assertEqual(self.state.update(lines_2_10(b"\x87 00:02 \x82001/012")), [2])
+        self.assertEqual(self.state.update(lines_2_10(b"\x87 00:02 \x82001/012")), [])
+
+    def test_now_playing(self):
+        self.assertEqual(self.state.now_playing, NowPlaying(None, None, None, None))
+        self.state.update(lines_2_10(b"\x87 01:23 \x82003/012"))
+        self.assertEqual(
+            self.state.now_playing, NowPlaying(PlayState.PLAYING, 83, 3, 12)
+        )
+        self.state.update(lines_2_10(b"\x88 01:24 \x82003/012"))
+        self.assertEqual(
+            self.state.now_playing, NowPlaying(PlayState.PAUSED, 84, 3, 12)
+        )
+
+    def test_parse_now_playing_line(self):
+        message = lines_2_10(b"\x89 00:00 \x82000/000 \x00\x00\x00\x00\x00")
+        self.assertEqual(
+            parse_now_playing_line(message.lines[0]),
+            NowPlaying(PlayState.STOPPED, 0, 0, 0),
+        )
+        self.assertEqual(
+            parse_now_playing_line("1:02:03"), NowPlaying(None, 3723, None, None)
+        )
+        self.assertEqual(
+            parse_now_playing_line("No Song"), NowPlaying(None, None, None, None)
+        )